@@ -0,0 +1,305 @@
+import json
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def _host_id():
+    """Хост и текущая загрузка системы: после перезагрузки pid-ы начинаются заново"""
+    try:
+        with open('/proc/sys/kernel/random/boot_id') as file:
+            boot_id = file.read().strip()
+    except OSError:
+        boot_id = ''
+    return f'{socket.gethostname()}/{boot_id}'
+
+
+def _current_owner():
+    return f'{_host_id()}:{os.getpid()}'
+
+
+def _is_foreign(owner):
+    """Принадлежит ли задание процессу другого хоста (контейнера) с общей базой"""
+    return bool(owner) and owner.rpartition(':')[0] != _host_id()
+
+
+def _owner_alive(owner):
+    """
+    Жив ли процесс, в очереди которого находится задание. Процессы других
+    хостов отсюда не проверить - они считаются живыми
+    """
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(':')
+    if host != _host_id():
+        return True
+    if int(pid) == os.getpid():
+        return True
+    if os.name == 'nt':
+        # В Windows os.kill завершает процесс, а не проверяет его; сервис там
+        # работает одним процессом
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AnalysisJobs:
+    """
+    Фоновые задания анализа больших пачек комментариев.
+    Задания выполняются пулом потоков с ограниченной очередью, а состояние
+    и результаты хранятся в SQLite - прогресс и результаты доступны из любого
+    воркера, а сами результаты не держатся в памяти.
+    Очередь - в памяти процесса, принявшего задание (owner). Задания
+    завершившихся процессов помечаются как failed при запуске и при обращении
+    к ним: иначе они остались бы queued / running навсегда. Задания процессов
+    других хостов (контейнеров с общей базой) помечаются как failed, только
+    если не обновлялись дольше stale_after секунд
+    """
+
+    def __init__(self, path, process, workers=2, max_queue=16, chunk_size=256, ttl=24 * 3600,
+                 stale_after=3600):
+        """
+        Args:
+            path (str): Путь к файлу базы заданий
+            process (callable): Функция list[комментарий] -> list[результат]
+            workers (int): Количество потоков, выполняющих задания
+            max_queue (int): Максимальное количество ожидающих заданий
+            chunk_size (int): Сколько комментариев обрабатывается и сохраняется за раз
+            ttl (float): Сколько секунд хранятся завершённые задания
+            stale_after (float): Через сколько секунд без обновлений незавершённое
+                задание другого хоста считается потерянным
+        """
+        self.path = path
+        self.process = process
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        self.stale_after = stale_after
+        self._queue = queue.Queue(max_queue)
+        self._threads = []
+        self._threads_pid = None
+        self._threads_lock = threading.Lock()
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' id TEXT PRIMARY KEY,'
+                ' status TEXT NOT NULL,'
+                ' total INTEGER NOT NULL,'
+                ' done INTEGER NOT NULL DEFAULT 0,'
+                ' error TEXT,'
+                ' created_at REAL NOT NULL,'
+                ' started_at REAL,'
+                ' finished_at REAL,'
+                ' owner TEXT,'
+                ' updated_at REAL'
+                ')'
+            )
+            # База, созданная до появления столбцов owner и updated_at
+            columns = {row[1] for row in connection.execute('PRAGMA table_info(jobs)')}
+            for column in ('owner TEXT', 'updated_at REAL'):
+                if column.split()[0] not in columns:
+                    connection.execute(f'ALTER TABLE jobs ADD COLUMN {column}')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS job_results ('
+                ' job_id TEXT NOT NULL,'
+                ' position INTEGER NOT NULL,'
+                ' result TEXT NOT NULL,'
+                ' PRIMARY KEY (job_id, position)'
+                ') WITHOUT ROWID'
+            )
+        self._fail_orphaned()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _ensure_workers(self):
+        # Потоки не переживают fork - в воркере запускаются при первом задании
+        with self._threads_lock:
+            if self._threads_pid == os.getpid():
+                return
+            self._queue = queue.Queue(self._queue.maxsize)
+            self._threads = [
+                threading.Thread(target=self._run, name=f'analysis-job-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            self._threads_pid = os.getpid()
+            for thread in self._threads:
+                thread.start()
+        # Новый воркер (например, перезапущенный gunicorn) подбирает задания
+        # воркеров, завершившихся с момента запуска
+        self._fail_orphaned()
+
+    def _fail_orphaned(self, job_id=None):
+        """
+        Помечает как failed незавершённые задания, процесс-владелец которых
+        завершился, и задания других хостов, не обновлявшиеся stale_after секунд
+        Args:
+            job_id (str): Проверить только это задание (None - все)
+        """
+        query = (
+            'SELECT id, owner, COALESCE(updated_at, started_at, created_at) FROM jobs'
+            " WHERE status IN ('queued', 'running')"
+        )
+        params = ()
+        if job_id is not None:
+            query += ' AND id = ?'
+            params = (job_id,)
+        now = time.time()
+        with self._connection() as connection:
+            orphaned = []
+            for orphan_id, owner, updated_at in connection.execute(query, params).fetchall():
+                if _is_foreign(owner):
+                    if updated_at < now - self.stale_after:
+                        orphaned.append((f'Job was not updated for {self.stale_after:.0f}s', now, orphan_id))
+                elif not _owner_alive(owner):
+                    orphaned.append(('Worker process exited before the job finished', now, orphan_id))
+            connection.executemany(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?"
+                " WHERE id = ? AND status IN ('queued', 'running')",
+                orphaned
+            )
+
+    def submit(self, comments):
+        """
+        Ставит задание в очередь
+        Args:
+            comments (list): [{'id': ..., 'text': ...}, ...]
+        Returns:
+            str: Идентификатор задания
+        Raises:
+            JobQueueFull: Очередь заданий заполнена
+        """
+        self._ensure_workers()
+        self._cleanup()
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute(
+                'INSERT INTO jobs (id, status, total, created_at, updated_at, owner) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, 'queued', len(comments), now, now, _current_owner())
+            )
+        try:
+            self._queue.put_nowait((job_id, comments))
+        except queue.Full:
+            with self._connection() as connection:
+                connection.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+            raise JobQueueFull()
+        return job_id
+
+    def get(self, job_id, offset=0, limit=100):
+        """
+        Состояние задания и страница готовых результатов
+        Returns:
+            dict: None, если задание не найдено
+        """
+        self._fail_orphaned(job_id)
+        connection = self._connection()
+        row = connection.execute(
+            'SELECT status, total, done, error, created_at, started_at, finished_at FROM jobs WHERE id = ?',
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        status, total, done, error, created_at, started_at, finished_at = row
+
+        results = [
+            json.loads(result) for result, in connection.execute(
+                'SELECT result FROM job_results WHERE job_id = ? AND position >= ? '
+                'ORDER BY position LIMIT ?',
+                (job_id, offset, limit)
+            )
+        ]
+        next_offset = offset + len(results)
+        job = {
+            'job_id': job_id,
+            'status': status,
+            'total': total,
+            'done': done,
+            'progress': round(done / total, 4) if total else 1.0,
+            'offset': offset,
+            'results': results,
+            'next_offset': next_offset if next_offset < total else None,
+        }
+        if error is not None:
+            job['error'] = error
+        if finished_at is not None and started_at is not None:
+            job['elapsed_ms'] = round((finished_at - started_at) * 1000, 3)
+        return job
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def _cleanup(self):
+        with self._connection() as connection:
+            expired = time.time() - self.ttl
+            connection.execute(
+                'DELETE FROM job_results WHERE job_id IN ('
+                ' SELECT id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?'
+                ')',
+                (expired,)
+            )
+            connection.execute(
+                'DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?', (expired,)
+            )
+
+    def _run(self):
+        while True:
+            job_id, comments = self._queue.get()
+            connection = self._connection()
+            try:
+                with connection:
+                    now = time.time()
+                    connection.execute(
+                        'UPDATE jobs SET status = ?, started_at = ?, updated_at = ? WHERE id = ?',
+                        ('running', now, now, job_id)
+                    )
+                for start in range(0, len(comments), self.chunk_size):
+                    chunk = comments[start:start + self.chunk_size]
+                    results = self.process(chunk)
+                    with connection:
+                        connection.executemany(
+                            'INSERT INTO job_results (job_id, position, result) VALUES (?, ?, ?)',
+                            [
+                                (job_id, start + i, json.dumps(result, ensure_ascii=False))
+                                for i, result in enumerate(results)
+                            ]
+                        )
+                        connection.execute(
+                            'UPDATE jobs SET done = ?, updated_at = ? WHERE id = ?',
+                            (start + len(chunk), time.time(), job_id)
+                        )
+                status, error = 'done', None
+            except Exception as err:
+                status, error = 'failed', f'{type(err).__name__}: {err}'
+            try:
+                with connection:
+                    now = time.time()
+                    connection.execute(
+                        'UPDATE jobs SET status = ?, error = ?, finished_at = ?, updated_at = ? WHERE id = ?',
+                        (status, error, now, now, job_id)
+                    )
+            except sqlite3.Error as err:
+                # Поток продолжает обрабатывать очередь, а незавершённое задание
+                # помечается как failed после завершения процесса (_fail_orphaned)
+                print(f'Analysis job {job_id}: failed to save status: {err}')
@@ -1,33 +1,262 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, abort, g, request, jsonify, stream_with_context
 from flask_cors import CORS
+from contextlib import nullcontext
+import os
+import threading
 import time
 from emotion_classifier import EmotionClassifier
+from inference_cache import InferenceCache, PersistentPredictionCache
+from analysis_jobs import AnalysisJobs, JobQueueFull
+from streaming import NDJSON_MIMETYPE, iter_json_comments, iter_ndjson_comments, batched
+import metrics
+from profiling import RequestProfiler
+import json
 from dotenv import dotenv_values
 import uuid as _uuid
 
-CONFIG = dotenv_values(".env")
+# Переменные окружения процесса переопределяют значения из .env
+CONFIG = {**dotenv_values(".env"), **os.environ}
+
+
+def config_flag(name, default=False):
+    value = CONFIG.get(name)
+    if not value:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
 
 app = Flask(__name__)
 CORS(app, resources={
     r"/api/*": {
         "origins": [CONFIG["BACKEND_API_URL"]],
         "methods": ["POST"],
-        "allow_headers": ["Content-Type"]
+        "allow_headers": ["Content-Type", "X-Profile"]
     }
 })
 
-emotion_classifier = EmotionClassifier('./model/trained/model.pth')
+cache_size = int(CONFIG.get('CACHE_SIZE') or 10000)
+cache_ttl = float(CONFIG.get('CACHE_TTL') or 0)
+persistent_cache_path = CONFIG.get('PERSISTENT_CACHE_PATH')
+persistent_cache_max_rows = int(CONFIG.get('PERSISTENT_CACHE_MAX_ROWS') or 0)
+persistent_cache_trim_every = int(CONFIG.get('PERSISTENT_CACHE_TRIM_EVERY') or 1000)
+
+emotion_classifier = EmotionClassifier(
+    CONFIG.get('MODEL_PATH') or './model/trained/model.pth',
+    backend=CONFIG.get('BACKEND') or 'torch',
+    onnx_path=CONFIG.get('ONNX_PATH') or './model/trained/model.onnx',
+    dynamic_padding=config_flag('DYNAMIC_PADDING', True),
+    quantize=config_flag('QUANTIZE'),
+    compat=config_flag('CLASSIFY_COMPAT'),
+    cache=InferenceCache(cache_size, cache_ttl or None) if cache_size > 0 else None,
+    prediction_cache=PersistentPredictionCache(
+        persistent_cache_path, persistent_cache_max_rows or None, persistent_cache_trim_every
+    ) if persistent_cache_path else None,
+    token_cache_size=int(CONFIG.get('TOKEN_CACHE_SIZE') or 10000),
+)
+
+if config_flag('MICRO_BATCHING'):
+    emotion_classifier.enable_micro_batching(
+        max_batch_size=int(CONFIG.get('MICRO_BATCH_SIZE') or 64),
+        max_wait_ms=float(CONFIG.get('MICRO_BATCH_WAIT_MS') or 10),
+    )
+
+readiness = {'status': 'starting', 'warmup_ms': None, 'error': None}
+# Процесс, в котором запущен прогрев: после fork воркер прогревается заново
+_warmup_pid = None
+_warmup_lock = threading.Lock()
+
+# Профилирование: для всех запросов (PROFILE) или по заголовку X-Profile: 1.
+# Трассы пишутся, только если задан PROFILE_DIR
+profile_all = config_flag('PROFILE')
+request_profiler = RequestProfiler(
+    CONFIG['PROFILE_DIR'], CONFIG.get('PROFILER') or 'cprofile'
+) if CONFIG.get('PROFILE_DIR') else None
+
+
+def start_warmup():
+    """
+    Прогрев модели в фоновом потоке текущего процесса: сервис сразу принимает
+    соединения, а /readyz отвечает 200 только после завершения прогрева.
+    Повторный вызов в том же процессе ничего не делает. Если сервис запущен
+    не через app.py / serve.py (gunicorn app:app, flask run), прогрев
+    начинается с первого запроса, в том числе к /readyz
+    """
+    global _warmup_pid
+    with _warmup_lock:
+        if _warmup_pid == os.getpid():
+            return
+        _warmup_pid = os.getpid()
 
-emotion_classifier.predict_raw('Я люблю писать код!')
-print('\nEmotion classifier is ready!\n')
+    def run():
+        start_time = time.perf_counter()
+        readiness['status'] = 'warming_up'
+        try:
+            emotion_classifier.warmup()
+        except Exception as err:
+            readiness['error'] = f'{type(err).__name__}: {err}'
+            readiness['status'] = 'failed'
+            return
+        readiness['warmup_ms'] = round((time.perf_counter() - start_time) * 1000, 3)
+        readiness['status'] = 'ready'
+        print('\nEmotion classifier is ready!\n')
+
+    threading.Thread(target=run, name='warmup', daemon=True).start()
 
 
 def uuid():
     return str(_uuid.uuid4())
 
 
+def classify_comments(comments, stats=None, detail='lean', top_k=0):
+    """
+    Классификация комментариев вида {'id': ..., 'text': ...}
+    Args:
+        detail (str): 'full' - добавить блок information с вероятностями и поправками
+        top_k (int): Добавить top_emotions - k самых вероятных исходных классов
+    Returns:
+        list: [{'id', 'text', 'sentiment', 'emotion'}, ...] в порядке комментариев
+    """
+    if stats is None:
+        stats = {}
+    ids = []
+    texts = []
+    for comment in comments:
+        texts.append(comment['text'])
+
+        if 'id' in comment:
+            ids.append(comment['id'])
+        else:
+            ids.append(uuid())
+
+    classification_results = emotion_classifier.classify_batch(
+        texts, detail=detail, top_k=top_k, stats=stats
+    )
+    COMMENTS.inc(len(texts))
+    for stage, value in stats['timings_ms'].items():
+        STAGE_LATENCY.observe(value / 1000, stage=stage.removesuffix('_ms'))
+
+    results = []
+    for id, text, classification_result in zip(ids, texts, classification_results):
+        result = {
+            'id': id,
+            'text': text,
+            'sentiment': classification_result['sentiment'],
+            'emotion': classification_result['emotion'],
+        }
+        if 'top_emotions' in classification_result:
+            result['top_emotions'] = classification_result['top_emotions']
+        if detail == 'full':
+            result['raw_emotion'] = classification_result['raw_emotion']
+            result['information'] = classification_result['information']
+        results.append(result)
+    return results
+
+
+def detail_options():
+    """Параметры подробности ответа из query string: ?detail=full&top_k=3"""
+    detail = request.args.get('detail', 'lean')
+    if detail not in ('lean', 'full'):
+        abort(400, description='detail must be "lean" or "full"')
+    top_k = request.args.get('top_k', default=0, type=int)
+    return {'detail': detail, 'top_k': min(max(top_k, 0), len(EmotionClassifier.CLASSES))}
+
+
+analysis_jobs = AnalysisJobs(
+    CONFIG.get('JOBS_DB_PATH') or './analysis_jobs.db',
+    classify_comments,
+    workers=int(CONFIG.get('JOBS_WORKERS') or 2),
+    max_queue=int(CONFIG.get('JOBS_MAX_QUEUE') or 16),
+    chunk_size=int(CONFIG.get('JOBS_CHUNK_SIZE') or 256),
+    stale_after=float(CONFIG.get('JOBS_STALE_AFTER') or 3600),
+)
+
+
+def cache_counters():
+    """Счётчики in-process кэша результатов по полям cache.stats()"""
+    if emotion_classifier.cache is None:
+        return {}
+    stats = emotion_classifier.cache.stats()
+    return {(name,): stats[name] for name in ('hits', 'misses')}
+
+
+def queue_depths():
+    return {
+        ('micro_batch',): emotion_classifier.scheduler.stats()['queue_depth']
+        if emotion_classifier.scheduler is not None else None,
+        ('jobs',): analysis_jobs.queue_depth(),
+    }
+
+
+# Метрики собираются в каждом процессе отдельно: при запуске через serve.py
+# каждый ответ /metrics описывает один воркер
+REQUEST_LATENCY = metrics.Histogram(
+    'comment_ai_request_duration_seconds', 'HTTP request latency',
+    labelnames=('endpoint', 'method', 'status'),
+)
+STAGE_LATENCY = metrics.Histogram(
+    'comment_ai_stage_duration_seconds',
+    'Time spent per classification stage (preprocess, queue, tokenize, model, postprocess)',
+    labelnames=('stage',),
+)
+COMMENTS = metrics.Counter('comment_ai_comments_total', 'Classified comments')
+metrics.Counter(
+    'comment_ai_cache_lookups_total', 'In-process result cache lookups',
+    labelnames=('result',), function=cache_counters,
+)
+metrics.Counter(
+    'comment_ai_cache_evictions_total', 'In-process result cache evictions',
+    function=lambda: emotion_classifier.cache.stats()['evictions'] if emotion_classifier.cache is not None else None,
+)
+metrics.Gauge(
+    'comment_ai_cache_hit_ratio', 'In-process result cache hit ratio',
+    function=lambda: emotion_classifier.cache.stats()['hit_rate'] if emotion_classifier.cache is not None else None,
+)
+metrics.Gauge(
+    'comment_ai_queue_depth', 'Texts waiting for micro-batching / analysis jobs waiting to run',
+    labelnames=('queue',), function=queue_depths,
+)
+metrics.Gauge(
+    'comment_ai_process_resident_memory_bytes', 'Resident set size of the process',
+    function=lambda: metrics.process_stats()['rss_bytes'],
+)
+metrics.Gauge(
+    'comment_ai_process_threads', 'OS threads of the process',
+    function=lambda: metrics.process_stats()['threads'],
+)
+metrics.Gauge(
+    'comment_ai_ready', 'Warmup finished and the model serves requests',
+    function=lambda: int(readiness['status'] == 'ready'),
+)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started_at = time.perf_counter()
+
+
+@app.before_request
+def ensure_warmup():
+    start_warmup()
+
+
+@app.after_request
+def observe_request_latency(response):
+    # Для потокового ответа учитывается время до начала передачи тела
+    if 'request_started_at' in g:
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - g.request_started_at,
+            endpoint=request.url_rule.rule if request.url_rule is not None else 'unmatched',
+            method=request.method,
+            status=response.status_code,
+        )
+    return response
+
+
 @app.route('/api/analyze', methods=['POST'])
 def analyze_comments():
+    if any(mimetype == NDJSON_MIMETYPE for mimetype, _ in request.accept_mimetypes):
+        return analyze_comments_stream()
+
     start_time = time.perf_counter()
 
     data = request.json
@@ -37,33 +266,125 @@ def analyze_comments():
         'elapsed_ms': 0,
         'amount': len(comments)
     }
-    comments_result = {}
-    for comment in comments:
-
-        text = comment['text']
-
-        if 'id' in comment:
-            id = comment['id']
-        else:
-            id = uuid()
 
-        classification_result = emotion_classifier.classify(text)
+    profile = profile_all or request.headers.get('X-Profile') == '1'
+    trace = request_profiler.trace('analyze') if profile and request_profiler is not None else nullcontext({})
 
-        comments_result[id] = {
-            'text': text,
-            'sentiment': classification_result['sentiment'],
-            'emotion': classification_result['emotion'],
-        }
+    classification_stats = {}
+    comments_result = {}
+    with trace as trace_result:
+        for result in classify_comments(comments, stats=classification_stats, **detail_options()):
+            comments_result[result.pop('id')] = result
 
     response['comments'] = comments_result
+    response['cache'] = {
+        'hits': classification_stats['cache_hits'],
+        'misses': classification_stats['cache_misses'],
+        'duplicates': classification_stats['duplicates'],
+    }
+    response['timings_ms'] = {
+        stage: round(value, 3) for stage, value in classification_stats['timings_ms'].items()
+    }
     end_time = time.perf_counter()
     processing_time_ms = (end_time - start_time) * 1000
     response['elapsed_ms'] = round(processing_time_ms, 3)
+    if profile:
+        stages_ms = dict(response['timings_ms'])
+        # Разбор JSON, сбор ответа и прочее, не вошедшее в этапы классификации
+        stages_ms['other_ms'] = round(processing_time_ms - sum(classification_stats['timings_ms'].values()), 3)
+        response['profile'] = {'stages_ms': stages_ms, 'trace': trace_result.get('path')}
 
     return jsonify(response)
 
 
+def analyze_comments_stream():
+    """
+    Потоковый режим /api/analyze (Accept: application/x-ndjson): тело запроса
+    читается по мере поступления, результаты отдаются по строке на комментарий
+    сразу после классификации очередной пачки. Последняя строка - итог
+    """
+    start_time = time.perf_counter()
+    batch_size = int(CONFIG.get('STREAM_BATCH_SIZE') or emotion_classifier.BATCH_SIZE)
+    options = detail_options()
+    if request.mimetype == NDJSON_MIMETYPE:
+        comments = iter_ndjson_comments(request.stream)
+    else:
+        comments = iter_json_comments(request.stream)
+
+    def generate():
+        amount = 0
+        try:
+            for batch in batched(comments, batch_size):
+                lines = [
+                    json.dumps(result, ensure_ascii=False) + '\n'
+                    for result in classify_comments(batch, **options)
+                ]
+                amount += len(batch)
+                yield ''.join(lines)
+        except Exception as err:
+            yield json.dumps({'error': f'{type(err).__name__}: {err}'}) + '\n'
+            return
+        elapsed_ms = round((time.perf_counter() - start_time) * 1000, 3)
+        yield json.dumps({'done': True, 'amount': amount, 'elapsed_ms': elapsed_ms}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+@app.route('/api/analyze/jobs', methods=['POST'])
+def create_analysis_job():
+    data = request.json
+    comments = data.get('comments', [])
+    try:
+        job_id = analysis_jobs.submit(comments)
+    except JobQueueFull:
+        return jsonify({'message': 'Analysis job queue is full, try again later'}), 503
+    return jsonify({'job_id': job_id, 'status': 'queued', 'amount': len(comments)}), 202
+
+
+@app.route('/api/analyze/jobs/<job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    offset = request.args.get('offset', default=0, type=int)
+    limit = min(request.args.get('limit', default=100, type=int), 1000)
+    job = analysis_jobs.get(job_id, offset=max(offset, 0), limit=max(limit, 0))
+    if job is None:
+        return jsonify({'message': 'Job not found'}), 404
+    return jsonify(job)
+
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({'status': 'ok'})
+
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    return jsonify(readiness), 200 if readiness['status'] == 'ready' else 503
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    stats = {'enabled': emotion_classifier.cache is not None}
+    if emotion_classifier.cache is not None:
+        stats.update(emotion_classifier.cache.stats())
+    if emotion_classifier.prediction_cache is not None:
+        stats['persistent'] = emotion_classifier.prediction_cache.stats()
+    return jsonify(stats)
+
+
+@app.route('/api/scheduler/stats', methods=['GET'])
+def scheduler_stats():
+    if emotion_classifier.scheduler is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **emotion_classifier.scheduler.stats()})
+
+
 if __name__ == '__main__':
+    start_warmup()
     app.run(
         port=int(CONFIG['PORT']),
         debug=True
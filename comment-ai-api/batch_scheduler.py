@@ -0,0 +1,148 @@
+from collections import deque
+import os
+import threading
+import time
+
+
+class _Request:
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.timings = None
+        self.result = None
+        self.error = None
+
+
+class MicroBatchScheduler:
+    """
+    Объединение текстов из одновременных запросов в общие пачки.
+    Пачка отправляется в модель, когда набрано max_batch_size текстов
+    или самый старый запрос в очереди прождал max_wait_ms
+    """
+
+    def __init__(self, forward, max_batch_size=64, max_wait_ms=10):
+        """
+        Args:
+            forward (callable): Функция (list[str], timings=dict) -> list[вероятности]
+            max_batch_size (int): Желаемый размер общей пачки (в текстах)
+            max_wait_ms (float): Максимальное ожидание заполнения пачки
+        """
+        self._forward = forward
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = deque()
+        self._queued_texts = 0
+        self._condition = threading.Condition()
+        self._worker = None
+        self._worker_pid = None
+
+        self.batches = 0
+        self.texts = 0
+        self.filled = 0
+        self.requests = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _ensure_worker(self):
+        # Поток не переживает fork - в дочернем процессе запускается заново
+        if self._worker is None or self._worker_pid != os.getpid():
+            self._queue.clear()
+            self._queued_texts = 0
+            self._worker = threading.Thread(target=self._run, name='micro-batch', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def forward(self, texts, timings=None):
+        """
+        Ставит тексты в очередь и ждёт результат общей пачки
+        Args:
+            timings (dict): Если передан, в него добавляется время ожидания
+                в очереди (queue_ms) и время этапов общей пачки
+        """
+        if not texts:
+            return []
+        request = _Request(texts)
+        with self._condition:
+            self._ensure_worker()
+            self._queue.append(request)
+            self._queued_texts += len(texts)
+            self._condition.notify()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        if timings is not None:
+            for name, value in request.timings.items():
+                timings[name] = timings.get(name, 0.0) + value
+        return request.result
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._queue:
+                self._condition.wait()
+            deadline = self._queue[0].enqueued_at + self.max_wait
+            while self._queued_texts < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch = []
+            size = 0
+            # Запрос больше max_batch_size уходит целиком, сам по себе
+            while self._queue and (not batch or size + len(self._queue[0].texts) <= self.max_batch_size):
+                request = self._queue.popleft()
+                batch.append(request)
+                size += len(request.texts)
+            self._queued_texts -= size
+            return batch, size
+
+    def _run(self):
+        while True:
+            batch, size = self._next_batch()
+            started_at = time.perf_counter()
+            timings = {}
+            try:
+                results = self._forward(
+                    [text for request in batch for text in request.texts], timings=timings
+                )
+            except Exception as err:
+                for request in batch:
+                    request.error = err
+                    request.done.set()
+                continue
+
+            offset = 0
+            for request in batch:
+                request.result = results[offset:offset + len(request.texts)]
+                request.timings = {'queue_ms': (started_at - request.enqueued_at) * 1000, **timings}
+                offset += len(request.texts)
+                request.done.set()
+
+            with self._condition:
+                self.batches += 1
+                self.texts += size
+                # Запрос больше max_batch_size заполняет пачку не больше чем на 100%
+                self.filled += min(size, self.max_batch_size)
+                self.requests += len(batch)
+                for request in batch:
+                    wait = started_at - request.enqueued_at
+                    self.wait_total += wait
+                    self.wait_max = max(self.wait_max, wait)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'queue_depth': self._queued_texts,
+                'queued_requests': len(self._queue),
+                'batches': self.batches,
+                'requests': self.requests,
+                'texts': self.texts,
+                'avg_batch_size': round(self.texts / self.batches, 2) if self.batches else 0.0,
+                'avg_fill_ratio': round(self.filled / (self.batches * self.max_batch_size), 4) if self.batches else 0.0,
+                'avg_wait_ms': round(self.wait_total / self.requests * 1000, 3) if self.requests else 0.0,
+                'max_wait_ms_observed': round(self.wait_max * 1000, 3),
+            }
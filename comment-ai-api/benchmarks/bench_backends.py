@@ -0,0 +1,61 @@
+"""
+Сравнение задержки и пропускной способности бэкендов torch и onnx.
+ONNX-модель предварительно создаётся скриптом export_onnx.py.
+Запуск из каталога comment-ai-api:
+    python -m benchmarks.bench_backends --model ./model/trained/model.pth --onnx ./model/trained/model.onnx
+"""
+import argparse
+import statistics
+import time
+
+from emotion_classifier import EmotionClassifier
+from benchmarks.corpus import generate_corpus
+from benchmarks.measure import percentile
+
+
+def measure(classifier, texts, batch_size, single_requests):
+    processed = [classifier._preprocess(text) for text in texts]
+    classifier._forward(processed[:batch_size], batch_size)
+
+    latencies = []
+    for text in processed[:single_requests]:
+        start = time.perf_counter()
+        classifier._forward([text])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    classifier._forward(processed, batch_size)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'p50_ms': statistics.median(latencies),
+        'p95_ms': percentile(latencies, 95),
+        'throughput': len(processed) / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='./model/trained/model.pth')
+    parser.add_argument('--onnx', default='./model/trained/model.onnx')
+    parser.add_argument('--size', type=int, default=512)
+    parser.add_argument('--batch-size', type=int, default=EmotionClassifier.BATCH_SIZE)
+    parser.add_argument('--single-requests', type=int, default=100)
+    args = parser.parse_args()
+
+    texts = generate_corpus(args.size)
+    classifiers = {
+        'torch': EmotionClassifier(args.model, dynamic_padding=True),
+        'onnx': EmotionClassifier(args.model, backend='onnx', onnx_path=args.onnx, dynamic_padding=True),
+    }
+    results = {}
+    for name, classifier in classifiers.items():
+        results[name] = measure(classifier, texts, args.batch_size, args.single_requests)
+        print(f'{name:<6} latency(1 text): p50={results[name]["p50_ms"]:.2f}ms '
+              f'p95={results[name]["p95_ms"]:.2f}ms  '
+              f'throughput(batch={args.batch_size}): {results[name]["throughput"]:.1f} texts/s')
+    print(f'onnx/torch throughput: {results["onnx"]["throughput"] / results["torch"]["throughput"]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Сравнение пакетного инференса с паддингом до MAX_LEN и с динамическим
+паддингом (группировка текстов по длине).
+Запуск из каталога comment-ai-api:
+    python -m benchmarks.bench_padding --model ./model/trained/model.pth
+"""
+import argparse
+import time
+
+from emotion_classifier import EmotionClassifier
+from benchmarks.corpus import generate_corpus, LENGTH_DISTRIBUTIONS
+
+
+def padding_efficiency(classifier, texts, batch_size):
+    """Доля реальных токенов среди всех токенов, поданных в модель"""
+    lengths = [
+        len(ids) for ids in classifier.tokenizer(
+            [classifier._preprocess(text) for text in texts],
+            max_length=classifier.MAX_LEN,
+            truncation=True,
+        )['input_ids']
+    ]
+    if classifier.dynamic_padding:
+        lengths_sorted = sorted(lengths)
+        padded = sum(
+            max(lengths_sorted[start:start + batch_size]) * len(lengths_sorted[start:start + batch_size])
+            for start in range(0, len(lengths_sorted), batch_size)
+        )
+    else:
+        padded = classifier.MAX_LEN * len(lengths)
+    return sum(lengths) / padded
+
+
+def measure(classifier, texts, batch_size, repeats):
+    classifier.predict_raw_batch(texts[:batch_size], batch_size=batch_size)
+    best = float('inf')
+    predictions = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predictions = classifier.predict_raw_batch(texts, batch_size=batch_size)
+        best = min(best, time.perf_counter() - start)
+    return best, predictions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='./model/trained/model.pth')
+    parser.add_argument('--size', type=int, default=512)
+    parser.add_argument('--batch-size', type=int, default=EmotionClassifier.BATCH_SIZE)
+    parser.add_argument('--distribution', default='realistic', choices=LENGTH_DISTRIBUTIONS)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    texts = generate_corpus(args.size, args.distribution)
+    # Без кэшей: повторные прогоны по тому же корпусу не должны пропускать токенизацию
+    classifier = EmotionClassifier(args.model, cache=None, token_cache_size=0)
+
+    results = {}
+    for dynamic_padding in (False, True):
+        classifier.dynamic_padding = dynamic_padding
+        elapsed, predictions = measure(classifier, texts, args.batch_size, args.repeats)
+        efficiency = padding_efficiency(classifier, texts, args.batch_size)
+        results[dynamic_padding] = (elapsed, predictions)
+        print(
+            f'dynamic_padding={dynamic_padding!s:5} '
+            f'time={elapsed:.3f}s throughput={len(texts) / elapsed:.1f} texts/s '
+            f'padding_efficiency={efficiency:.1%}'
+        )
+
+    (static_time, static_predictions), (dynamic_time, dynamic_predictions) = results[False], results[True]
+    max_diff = max(
+        abs(static[emotion] - dynamic[emotion])
+        for static, dynamic in zip(static_predictions, dynamic_predictions)
+        for emotion in EmotionClassifier.CLASSES
+    )
+    same_top = sum(
+        next(iter(static)) == next(iter(dynamic))
+        for static, dynamic in zip(static_predictions, dynamic_predictions)
+    )
+    print(f'speedup={static_time / dynamic_time:.2f}x max_prob_diff={max_diff:.2e} '
+          f'same_top_emotion={same_top}/{len(texts)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+Воспроизводимый набор бенчмарков инференса: EmotionClassifier.classify_batch
+и /api/analyze (через Flask test client, без сети) на синтетических корпусах
+разной длины и разных размерах запроса. Для каждого сценария - пропускная
+способность, p50/p95/p99 задержки запроса и пиковый RSS. Результаты
+сохраняются в JSON вместе с коммитом и окружением для сравнения между
+коммитами. Работает офлайн и только на CPU; кэши результатов и токенов
+отключаются, чтобы замерялся полный путь инференса.
+Запуск из каталога comment-ai-api:
+    python -m benchmarks.bench_suite --output bench-results/$(git rev-parse --short HEAD).json
+    python -m benchmarks.bench_suite --targets classifier app --batch-sizes 1 32
+    python -m benchmarks.bench_suite --compare bench-results/old.json bench-results/new.json
+"""
+import os
+
+# До импорта torch/transformers: только CPU и никаких обращений к Hugging Face Hub
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+os.environ.setdefault('HF_HUB_OFFLINE', '1')
+os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+
+import argparse
+import json
+import time
+
+from emotion_classifier import EmotionClassifier
+from benchmarks.corpus import LENGTH_DISTRIBUTIONS, generate_corpus
+from benchmarks.measure import environment, latency_summary, peak_rss_mb, reset_peak_rss, rss_mb
+
+
+def classifier_target(classifier):
+    def run(texts):
+        classifier.classify_batch(texts, detail='lean')
+    return run
+
+
+def app_target(ready_timeout=600):
+    import app
+
+    # Фоновый прогрев занимает те же потоки CPU: замер начинается после него
+    app.start_warmup()
+    deadline = time.monotonic() + ready_timeout
+    while app.readiness['status'] != 'ready':
+        if app.readiness['status'] == 'failed':
+            raise RuntimeError(f"Warmup failed: {app.readiness['error']}")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f'Warmup is not finished after {ready_timeout}s')
+        time.sleep(0.1)
+
+    classifier = app.emotion_classifier
+    classifier.cache = None
+    classifier.token_cache = None
+    classifier.prediction_cache = None
+    client = app.app.test_client()
+
+    def run(texts):
+        payload = {'comments': [{'id': str(i), 'text': text} for i, text in enumerate(texts)]}
+        response = client.post('/api/analyze', json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f'/api/analyze returned {response.status_code}')
+    return run
+
+
+def run_scenario(run, distribution, batch_size, requests, seed):
+    texts = generate_corpus(batch_size * (requests + 1), distribution, seed)
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    # Первый запрос - прогрев под формы этого сценария, в замер не входит
+    run(batches[0])
+
+    reset_peak_rss()
+    latencies = []
+    started_at = time.perf_counter()
+    for batch in batches[1:]:
+        request_started_at = time.perf_counter()
+        run(batch)
+        latencies.append((time.perf_counter() - request_started_at) * 1000)
+    elapsed = time.perf_counter() - started_at
+
+    return {
+        'distribution': distribution,
+        'batch_size': batch_size,
+        'requests': requests,
+        'throughput_texts_s': round(batch_size * requests / elapsed, 2),
+        **latency_summary(latencies),
+        'rss_mb': rss_mb(),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def compare(base_path, new_path):
+    with open(base_path) as file:
+        base = json.load(file)
+    with open(new_path) as file:
+        new = json.load(file)
+
+    def key(result):
+        return result['target'], result['distribution'], result['batch_size']
+
+    base_results = {key(result): result for result in base['results']}
+    print(f'{base["environment"]["commit"]} -> {new["environment"]["commit"]}')
+    print(f'{"target":<11} {"distribution":<10} {"batch":>5} {"throughput":>11} {"p95":>8} {"peak_rss":>9}')
+    for result in new['results']:
+        old = base_results.get(key(result))
+        if old is None:
+            continue
+        peak_diff = (
+            f'{result["peak_rss_mb"] - old["peak_rss_mb"]:+.0f}MB'
+            if result['peak_rss_mb'] is not None and old['peak_rss_mb'] is not None else '-'
+        )
+        print(
+            f'{result["target"]:<11} {result["distribution"]:<10} {result["batch_size"]:>5} '
+            f'{result["throughput_texts_s"] / old["throughput_texts_s"]:>10.2f}x '
+            f'{result["p95_ms"] / old["p95_ms"]:>7.2f}x {peak_diff:>9}'
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='./model/trained/model.pth')
+    parser.add_argument('--backend', default='torch', choices=['torch', 'onnx'])
+    parser.add_argument('--onnx', default='./model/trained/model.onnx')
+    parser.add_argument('--targets', nargs='+', default=['classifier'], choices=['classifier', 'app'])
+    parser.add_argument('--distributions', nargs='+', default=list(LENGTH_DISTRIBUTIONS),
+                        choices=list(LENGTH_DISTRIBUTIONS))
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32, 128])
+    parser.add_argument('--texts', type=int, default=1024, help='Текстов на сценарий (не меньше 10 запросов)')
+    parser.add_argument('--threads', type=int, help='torch.set_num_threads')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='JSON-файл с результатами')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='Сравнить два JSON-файла')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    import torch
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    targets = {}
+    if 'classifier' in args.targets:
+        targets['classifier'] = classifier_target(EmotionClassifier(
+            args.model, backend=args.backend, onnx_path=args.onnx,
+            dynamic_padding=True, token_cache_size=0,
+        ))
+    if 'app' in args.targets:
+        # Модель и параметры - из .env, как при обычном запуске сервиса
+        targets['app'] = app_target()
+
+    results = []
+    print(f'{"target":<11} {"distribution":<10} {"batch":>5} {"texts/s":>9} '
+          f'{"p50":>8} {"p95":>8} {"p99":>8} {"peak_rss":>9}')
+    for target, run in targets.items():
+        for distribution in args.distributions:
+            for batch_size in args.batch_sizes:
+                requests = max(10, args.texts // batch_size)
+                result = {'target': target, **run_scenario(run, distribution, batch_size, requests, args.seed)}
+                results.append(result)
+                print(
+                    f'{target:<11} {distribution:<10} {batch_size:>5} {result["throughput_texts_s"]:>9.1f} '
+                    f'{result["p50_ms"]:>8.2f} {result["p95_ms"]:>8.2f} {result["p99_ms"]:>8.2f} '
+                    f'{result["peak_rss_mb"] or 0:>7.0f}MB'
+                )
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as file:
+            json.dump({'environment': environment(), 'args': vars(args), 'results': results}, file, indent=2)
+        print(f'Saved to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
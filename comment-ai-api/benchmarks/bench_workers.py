@@ -0,0 +1,102 @@
+"""
+Масштабирование пропускной способности serve.py по количеству воркеров.
+Для каждого N из --workers запускается сервер с N воркерами по
+--threads-per-worker потоков инференса и нагружается запросами
+/api/analyze в --concurrency-per-worker * N потоков. Кэши результатов
+и токенизации в сервере отключены: запросы повторяются по кругу, и с
+кэшами замерялись бы HTTP и поиск в словаре, а не модель.
+Запуск из каталога comment-ai-api:
+    python -m benchmarks.bench_workers --workers 1 2 4 --duration 20
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.corpus import generate_corpus
+
+
+# Без кэшей: каждый запрос проходит через модель. Пустой PERSISTENT_CACHE_PATH
+# переопределяет значение из .env
+NO_CACHE_ENV = {'CACHE_SIZE': '0', 'TOKEN_CACHE_SIZE': '0', 'PERSISTENT_CACHE_PATH': ''}
+
+
+def wait_ready(base_url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'{base_url}/readyz', timeout=5).status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f'{base_url} is not ready after {timeout}s')
+
+
+def drive(url, payloads, concurrency, duration):
+    """Запросы в concurrency потоков в течение duration секунд"""
+    deadline = time.monotonic() + duration
+
+    def client(offset):
+        session = requests.Session()
+        count = 0
+        while time.monotonic() < deadline:
+            response = session.post(url, json=payloads[(offset + count) % len(payloads)], timeout=60)
+            response.raise_for_status()
+            count += 1
+        return count
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(concurrency) as executor:
+        total = sum(executor.map(client, range(concurrency)))
+    return total, time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    parser.add_argument('--concurrency-per-worker', type=int, default=2)
+    parser.add_argument('--comments-per-request', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    texts = generate_corpus(args.comments_per_request * 64)
+    payloads = [
+        {'comments': [
+            {'id': str(i), 'text': text}
+            for i, text in enumerate(texts[start:start + args.comments_per_request])
+        ]}
+        for start in range(0, len(texts), args.comments_per_request)
+    ]
+    base_url = f'http://127.0.0.1:{args.port}'
+
+    baseline = None
+    for workers in args.workers:
+        server = subprocess.Popen([
+            sys.executable, 'serve.py',
+            '--workers', str(workers),
+            '--threads-per-worker', str(args.threads_per_worker),
+            '--port', str(args.port),
+            '--host', '127.0.0.1',
+        ], env={**os.environ, **NO_CACHE_ENV}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(base_url, timeout=300)
+            requests_done, elapsed = drive(f'{base_url}/api/analyze', payloads, workers * args.concurrency_per_worker, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+
+        throughput = requests_done * args.comments_per_request / elapsed
+        baseline = baseline or throughput / workers
+        print(f'workers={workers:<3} requests/s={requests_done / elapsed:8.1f} '
+              f'comments/s={throughput:8.1f} scaling_efficiency={throughput / (baseline * workers):.0%}')
+
+
+if __name__ == '__main__':
+    main()
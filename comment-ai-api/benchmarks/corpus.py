@@ -0,0 +1,49 @@
+"""Синтетические корпуса русскоязычных комментариев для бенчмарков"""
+import random
+
+WORDS = [
+    'я', 'ты', 'мы', 'это', 'очень', 'просто', 'всё', 'не', 'так', 'как', 'уже', 'ещё',
+    'спасибо', 'класс', 'отлично', 'ужасно', 'люблю', 'ненавижу', 'интересно', 'странно',
+    'видео', 'автор', 'статья', 'комментарий', 'товар', 'доставка', 'магазин', 'качество',
+    'цена', 'время', 'день', 'работа', 'проблема', 'вопрос', 'ответ', 'друзья', 'город',
+    'хороший', 'плохой', 'новый', 'старый', 'красивый', 'грустный', 'смешной', 'страшный',
+    'думаю', 'кажется', 'понравилось', 'разочаровал', 'удивил', 'жду', 'советую', 'купил',
+    'пришёл', 'сломался', 'работает', 'помогло', 'согласен', 'против', 'почему', 'зачем',
+    'наконец', 'опять', 'никогда', 'всегда', 'сегодня', 'вчера', 'лучше', 'хуже', 'больше',
+]
+PHRASES = ['спасибо', 'класс!', 'супер', 'ужас', 'согласен', 'лол', 'круто!', 'жаль(']
+PUNCTUATION = ['.', '!', '?', ',', '...', ')']
+
+# Параметры логнормального распределения числа слов (mu, sigma)
+LENGTH_DISTRIBUTIONS = {
+    'short': (1.0, 0.5),
+    'realistic': (2.0, 0.8),
+    'long': (3.5, 0.5),
+}
+
+
+def generate_comment(rnd, distribution='realistic'):
+    mu, sigma = LENGTH_DISTRIBUTIONS[distribution]
+    words_count = max(1, int(rnd.lognormvariate(mu, sigma)))
+    if words_count == 1:
+        return rnd.choice(PHRASES)
+    words = [rnd.choice(WORDS) for _ in range(words_count)]
+    words[0] = words[0].capitalize()
+    for i in range(len(words) - 1):
+        if rnd.random() < 0.1:
+            words[i] += rnd.choice(PUNCTUATION)
+    return ' '.join(words) + rnd.choice(PUNCTUATION)
+
+
+def generate_corpus(size, distribution='realistic', seed=42):
+    """
+    Генерация воспроизводимого корпуса комментариев
+    Args:
+        size (int): Количество комментариев
+        distribution (str): Распределение длины (ключ LENGTH_DISTRIBUTIONS)
+        seed (int): Зерно генератора
+    Returns:
+        list: Список текстов
+    """
+    rnd = random.Random(seed)
+    return [generate_comment(rnd, distribution) for _ in range(size)]
@@ -0,0 +1,259 @@
+"""
+Нагрузочный тест /api/analyze по HTTP в роли Node-бэкенда: запросы того же
+вида, что отправляет aiController.analyze ({comments: [{id, text}]}, id -
+строки, как bigint из node-postgres), со смесью размеров запросов. Для
+каждого уровня параллелизма клиенты в замкнутом цикле шлют запросы
+--duration секунд; по уровням строится кривая насыщения: где пропускная
+способность выходит на плато, а задержка начинает расти.
+
+Сервер либо уже запущен (--url), либо поднимается скриптом в каждом из
+режимов --modes. С --stub сервис запускается с BACKEND=stub - без модели,
+чтобы замерить только HTTP-слой, предобработку и сериализацию. Кэши
+результатов и токенизации в запускаемом сервисе по умолчанию отключены:
+иначе кривые зависели бы от доли попаданий, числа воркеров и длительности
+прогона; с --cache сервис работает с кэшами из .env.
+Запуск из каталога comment-ai-api:
+    python -m benchmarks.load_test --modes flask gunicorn gunicorn-microbatch --output load.json --plot load.png
+    python -m benchmarks.load_test --modes gunicorn --stub --concurrency 1 4 16 64
+    python -m benchmarks.load_test --modes gunicorn --cache
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --size-mix 1:0.5 50:0.5
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.measure import environment, latency_summary
+
+# Режим -> (аргументы python, переменные окружения сервиса)
+MODES = {
+    'flask': (['app.py'], {}),
+    'gunicorn': (['serve.py', '--host', '127.0.0.1'], {}),
+    'gunicorn-microbatch': (['serve.py', '--host', '127.0.0.1'], {'MICRO_BATCHING': 'true'}),
+}
+
+# Без кэшей: каждый запрос проходит через модель. Пустой PERSISTENT_CACHE_PATH
+# переопределяет значение из .env
+NO_CACHE_ENV = {'CACHE_SIZE': '0', 'TOKEN_CACHE_SIZE': '0', 'PERSISTENT_CACHE_PATH': ''}
+
+# Количество комментариев в запросе -> доля запросов: от анализа одного
+# комментария до выделения целой страницы
+DEFAULT_SIZE_MIX = ['1:0.3', '10:0.4', '50:0.2', '200:0.1']
+
+
+def parse_size_mix(items):
+    sizes, weights = [], []
+    for item in items:
+        size, weight = item.split(':')
+        sizes.append(int(size))
+        weights.append(float(weight))
+    return sizes, weights
+
+
+class PayloadFactory:
+    """Тела запросов со смесью размеров из общего пула синтетических комментариев"""
+
+    def __init__(self, size_mix, corpus_size, seed):
+        self.sizes, self.weights = parse_size_mix(size_mix)
+        self.texts = generate_corpus(corpus_size, seed=seed)
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def make(self, rnd):
+        size = rnd.choices(self.sizes, self.weights)[0]
+        with self._lock:
+            first_id = self._next_id
+            self._next_id += size
+        start = rnd.randrange(len(self.texts))
+        return {'comments': [
+            {'id': str(first_id + i), 'text': self.texts[(start + i) % len(self.texts)]}
+            for i in range(size)
+        ]}
+
+
+def wait_ready(base_url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'{base_url}/readyz', timeout=5).status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f'{base_url} is not ready after {timeout}s')
+
+
+def start_server(mode, port, workers, stub, cache=False):
+    args, env = MODES[mode]
+    env = {**os.environ, **env, 'PORT': str(port)}
+    if not cache:
+        env.update(NO_CACHE_ENV)
+    if stub:
+        env['BACKEND'] = 'stub'
+    if mode != 'flask':
+        args = args + ['--port', str(port), '--workers', str(workers)]
+    # Отдельная группа процессов: вместе с сервером завершаются воркеры
+    # gunicorn и дочерний процесс перезагрузчика Flask
+    return subprocess.Popen(
+        [sys.executable] + args, env=env, start_new_session=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def stop_server(server):
+    try:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(server.pid, signal.SIGKILL)
+        server.wait()
+    except ProcessLookupError:
+        pass
+
+
+def run_level(url, factory, concurrency, duration, seed):
+    """Замкнутый цикл: concurrency клиентов, каждый шлёт следующий запрос после ответа"""
+    deadline = time.monotonic() + duration
+
+    def client(index):
+        rnd = random.Random(seed * 1000 + index)
+        session = requests.Session()
+        latencies, comments, errors = [], 0, 0
+        while time.monotonic() < deadline:
+            payload = factory.make(rnd)
+            started_at = time.perf_counter()
+            try:
+                response = session.post(url, json=payload, timeout=120)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - started_at) * 1000)
+                comments += len(payload['comments'])
+            else:
+                errors += 1
+        return latencies, comments, errors
+
+    started_at = time.monotonic()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(client, range(concurrency)))
+    elapsed = time.monotonic() - started_at
+
+    latencies = [latency for client_latencies, _, _ in results for latency in client_latencies]
+    result = {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': sum(errors for _, _, errors in results),
+        'requests_s': round(len(latencies) / elapsed, 2),
+        'comments_s': round(sum(comments for _, comments, _ in results) / elapsed, 2),
+    }
+    if latencies:
+        result.update(latency_summary(latencies))
+    return result
+
+
+def mark_saturation(levels, plateau_gain=1.1):
+    """
+    Уровень насыщения - первый, после которого рост параллелизма даёт меньше
+    plateau_gain прироста пропускной способности
+    """
+    for previous, current in zip(levels, levels[1:]):
+        if current['comments_s'] < previous['comments_s'] * plateau_gain:
+            return previous['concurrency']
+    return None
+
+
+def plot(report, path):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    figure, (throughput_axis, latency_axis) = plt.subplots(1, 2, figsize=(12, 4.5))
+    for mode, result in report['modes'].items():
+        levels = [level for level in result['levels'] if level['requests']]
+        concurrency = [level['concurrency'] for level in levels]
+        throughput_axis.plot(concurrency, [level['comments_s'] for level in levels], marker='o', label=mode)
+        latency_axis.plot(concurrency, [level['p95_ms'] for level in levels], marker='o', label=mode)
+    throughput_axis.set(xscale='log', xlabel='concurrency', ylabel='comments/s', title='Throughput')
+    latency_axis.set(xscale='log', yscale='log', xlabel='concurrency', ylabel='p95, ms', title='Latency')
+    for axis in (throughput_axis, latency_axis):
+        axis.grid(True, which='both', alpha=0.3)
+        axis.legend()
+    figure.tight_layout()
+    figure.savefig(path, dpi=120)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='Адрес уже запущенного сервиса (вместо --modes)')
+    parser.add_argument('--modes', nargs='+', default=['gunicorn'], choices=list(MODES))
+    parser.add_argument('--stub', action='store_true', help='Сервис без модели (BACKEND=stub)')
+    parser.add_argument('--cache', action='store_true', help='Не отключать кэши сервиса (настройки из .env)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Воркеры gunicorn')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--size-mix', nargs='+', default=DEFAULT_SIZE_MIX, help='размер:доля')
+    parser.add_argument('--duration', type=float, default=15, help='Секунд на уровень параллелизма')
+    parser.add_argument('--corpus-size', type=int, default=20000)
+    parser.add_argument('--port', type=int, default=5098)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='JSON-файл с результатами')
+    parser.add_argument('--plot', help='PNG с кривыми насыщения (matplotlib)')
+    args = parser.parse_args()
+
+    factory = PayloadFactory(args.size_mix, args.corpus_size, args.seed)
+    targets = {'external': args.url} if args.url else {
+        mode + ('-stub' if args.stub else ''): mode for mode in args.modes
+    }
+
+    # Для --url кэши определяет уже запущенный сервис
+    report = {
+        'environment': environment(), 'args': vars(args),
+        'server_cache': 'external' if args.url else ('enabled' if args.cache else 'disabled'),
+        'modes': {},
+    }
+    for name, target in targets.items():
+        server = None
+        base_url = args.url.rstrip('/') if args.url else f'http://127.0.0.1:{args.port}'
+        if not args.url:
+            server = start_server(target, args.port, args.workers, args.stub, args.cache)
+        try:
+            wait_ready(base_url, timeout=300)
+            print(f'\n{name}')
+            print(f'{"concurrency":>11} {"req/s":>8} {"comments/s":>11} {"p50":>8} {"p95":>8} {"p99":>8} {"errors":>7}')
+            levels = []
+            for concurrency in args.concurrency:
+                level = run_level(f'{base_url}/api/analyze', factory, concurrency, args.duration, args.seed)
+                levels.append(level)
+                print(
+                    f'{concurrency:>11} {level["requests_s"]:>8.1f} {level["comments_s"]:>11.1f} '
+                    f'{level.get("p50_ms", 0):>8.1f} {level.get("p95_ms", 0):>8.1f} '
+                    f'{level.get("p99_ms", 0):>8.1f} {level["errors"]:>7}'
+                )
+        finally:
+            if server is not None:
+                stop_server(server)
+
+        saturation = mark_saturation(levels)
+        print(f'saturation at concurrency={saturation}' if saturation else 'no plateau reached')
+        report['modes'][name] = {'saturation_concurrency': saturation, 'levels': levels}
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f'Saved to {args.output}')
+    if args.plot:
+        plot(report, args.plot)
+        print(f'Plot saved to {args.plot}')
+
+
+if __name__ == '__main__':
+    main()
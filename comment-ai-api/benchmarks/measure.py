@@ -0,0 +1,113 @@
+"""
+Общие замеры для бенчмарков, convert_model.py и обучения: перцентили
+задержек и память процесса. Модуль resource (его нет в Windows)
+импортируется только при необходимости
+"""
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def latency_summary(latencies_ms):
+    """p50/p95/p99/среднее по списку задержек в мс"""
+    return {
+        'p50_ms': round(statistics.median(latencies_ms), 3),
+        'p95_ms': round(percentile(latencies_ms, 95), 3),
+        'p99_ms': round(percentile(latencies_ms, 99), 3),
+        'mean_ms': round(statistics.fmean(latencies_ms), 3),
+    }
+
+
+def _proc_status(field):
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    """
+    Сброс пикового RSS процесса (Linux, /proc/self/clear_refs), чтобы
+    peak_rss_mb() показывал пик с этого момента, а не с запуска
+    Returns:
+        bool: Удалось ли сбросить
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _psutil_memory():
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info()
+
+
+def rss_mb():
+    """Текущий RSS в МБ (VmRSS, иначе psutil); None, если узнать нельзя"""
+    rss = _proc_status('VmRSS')
+    if rss is None:
+        memory = _psutil_memory()
+        rss = memory.rss / 2 ** 20 if memory is not None else None
+    return rss
+
+
+def peak_rss_mb():
+    """
+    Пиковый RSS в МБ: VmHWM (сбрасывается reset_peak_rss), иначе ru_maxrss -
+    пик с запуска процесса (в Linux переживает exec и включает пик
+    родительского процесса), иначе psutil; None, если узнать нельзя
+    """
+    peak = _proc_status('VmHWM')
+    if peak is not None:
+        return peak
+    try:
+        import resource
+    except ImportError:
+        memory = _psutil_memory()
+        if memory is None:
+            return None
+        # peak_wset - пиковый рабочий набор в Windows
+        return getattr(memory, 'peak_wset', memory.rss) / 2 ** 20
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss в Linux - в килобайтах, в macOS - в байтах
+    return maxrss / 2 ** 20 if sys.platform == 'darwin' else maxrss / 1024
+
+
+def environment():
+    """Сведения о коммите и окружении для сравнения результатов между запусками"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    info = {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+    if 'torch' in sys.modules:
+        torch = sys.modules['torch']
+        info['torch'] = torch.__version__
+        info['torch_threads'] = torch.get_num_threads()
+    return info
@@ -0,0 +1,109 @@
+"""
+Сборка каталога модели из чекпоинта model.pth: config.json, файлы
+токенизатора и дообученные веса в model.safetensors. Из такого каталога
+EmotionClassifier загружается без Hugging Face кэша, а веса читаются
+через mmap сразу в параметры модели - без второй полной копии state dict.
+Скрипт сверяет выходы и замеряет время запуска и пиковый RSS до и после.
+Запуск:
+    python convert_model.py --model ./model/trained/model.pth --output ./model/trained/model
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from emotion_classifier import EmotionClassifier, write_weights_hash
+from benchmarks.corpus import generate_corpus
+from benchmarks.measure import peak_rss_mb
+
+
+def convert(classifier, output_dir):
+    classifier.model.save_pretrained(output_dir, safe_serialization=True)
+    classifier.tokenizer.save_pretrained(output_dir)
+    # Отпечаток модели для кэшей без чтения весов при каждом запуске сервиса
+    write_weights_hash(os.path.join(output_dir, 'model.safetensors'))
+
+
+def probe_startup(model_path):
+    """Запуск в отдельном процессе: загрузка и прогрев классификатора с нуля"""
+    started_at = time.perf_counter()
+    classifier = EmotionClassifier(model_path, dynamic_padding=True)
+    loaded_at = time.perf_counter()
+    # Пик после загрузки - отдельно: прогрев на длинных пачках может его превысить
+    load_peak_rss_mb = peak_rss_mb()
+    classifier.warmup()
+    finished_at = time.perf_counter()
+    print(json.dumps({
+        'load_s': round(loaded_at - started_at, 3),
+        'startup_s': round(finished_at - started_at, 3),
+        'load_peak_rss_mb': load_peak_rss_mb,
+        'peak_rss_mb': peak_rss_mb(),
+    }))
+
+
+def measure_startup(model_path, repeats):
+    runs = []
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, __file__, '--probe', model_path],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        # Вместе с запуском интерпретатора и импортами
+        run['process_s'] = round(time.perf_counter() - started_at, 3)
+        runs.append(run)
+    return {
+        name: float(np.median([run[name] for run in runs])) if runs[0][name] is not None else None
+        for name in runs[0]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='./model/trained/model.pth')
+    parser.add_argument('--output', default='./model/trained/model')
+    parser.add_argument('--check-size', type=int, default=256, help='Количество текстов для сверки')
+    parser.add_argument('--tolerance', type=float, default=1e-5)
+    parser.add_argument('--repeats', type=int, default=3, help='Запусков на замер времени старта')
+    parser.add_argument('--probe', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        probe_startup(args.probe)
+        return
+
+    checkpoint_classifier = EmotionClassifier(args.model, dynamic_padding=True)
+    convert(checkpoint_classifier, args.output)
+    print(f'Saved to {args.output}')
+
+    converted_classifier = EmotionClassifier(args.output, dynamic_padding=True)
+    texts = [checkpoint_classifier._preprocess(text) for text in generate_corpus(args.check_size)]
+    expected = np.array(checkpoint_classifier._forward(texts))
+    actual = np.array(converted_classifier._forward(texts))
+    max_diff = float(np.abs(expected - actual).max())
+    print(f'max_prob_diff={max_diff:.2e}')
+    if max_diff > args.tolerance:
+        print(f'Difference exceeds tolerance {args.tolerance}')
+        sys.exit(1)
+    del checkpoint_classifier, converted_classifier
+
+    print(f'{"model":<40} {"process_s":>10} {"load_s":>8} {"startup_s":>10} {"load_peak_mb":>13} {"peak_rss_mb":>12}')
+    for path in (args.model, args.output):
+        result = measure_startup(path, args.repeats)
+        load_peak, peak = (
+            f'{result[name]:.1f}' if result[name] is not None else '-'
+            for name in ('load_peak_rss_mb', 'peak_rss_mb')
+        )
+        print(
+            f'{path:<40} {result["process_s"]:>10.3f} {result["load_s"]:>8.3f} '
+            f'{result["startup_s"]:>10.3f} {load_peak:>13} {peak:>12}'
+        )
+
+
+if __name__ == '__main__':
+    main()
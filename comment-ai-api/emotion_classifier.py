@@ -1,7 +1,43 @@
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import re
-import string
+import numpy as np
+import functools
+import hashlib
+import os
+import time
+from text_preprocessing import preprocess_text, preprocess_batch
+from inference_cache import InferenceCache
+from inference_backends import TorchBackend, OnnxBackend, StubBackend, StubTokenizer
+from batch_scheduler import MicroBatchScheduler
+from metrics import Histogram
+
+MODEL_BATCH_SIZE = Histogram(
+    'comment_ai_model_batch_size', 'Texts per forward pass of the model',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+
+def add_timing(timings, name, seconds):
+    """Накопление времени этапа (в мс) в словаре timings"""
+    timings[name] = timings.get(name, 0.0) + seconds * 1000
+
+
+# Хэш содержимого файла весов, записанный рядом с ним (см. write_weights_hash)
+WEIGHTS_HASH_SUFFIX = '.sha256'
+
+
+def write_weights_hash(path):
+    """
+    Записывает SHA-256 файла весов в path + WEIGHTS_HASH_SUFFIX: по нему
+    отпечаток модели строится без чтения весов при каждом запуске. Для
+    каталога из convert_model.py хэш записывается при конвертации, для .pth -
+    командой python -m emotion_classifier --write-hash PATH после копирования
+    весов (хэш, который старше весов, не используется)
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    with open(path + WEIGHTS_HASH_SUFFIX, 'w') as file:
+        file.write(digest.hexdigest())
 
 
 class EmotionClassifier:
@@ -44,68 +80,323 @@ class EmotionClassifier:
         'pride', 'realization', 'relief', 'remorse', 'sadness', 'surprise', 'neutral'
     ]
     MAX_LEN = 128
+    BATCH_SIZE = 32
+
+    _compiled_groupings = {}
 
     model_path = None
 
-    def __init__(self, model_path):
-        """Инициализация модели при создании экземпляра класса"""
+    def __init__(self, model_path, *, backend='torch', onnx_path=None, dynamic_padding=False,
+                 quantize=False, compat=False, cache=None, prediction_cache=None,
+                 token_cache_size=10000):
+        """
+        Инициализация модели при создании экземпляра класса
+        Args:
+            model_path (str): Путь к весам дообученной модели: чекпоинт .pth
+                или каталог модели из convert_model.py (config, токенизатор
+                и веса в safetensors)
+            backend (str): 'torch', 'onnx' (onnxruntime, модель из export_onnx.py)
+                или 'stub' (без модели, для нагрузочных тестов HTTP-слоя)
+            onnx_path (str): Путь к ONNX-модели для backend='onnx'
+            dynamic_padding (bool): Дополнять пачку до самого длинного текста
+                в ней (а не до MAX_LEN) и группировать тексты по длине
+            quantize (bool): Динамическое int8-квантование линейных слоёв
+                (быстрее и экономнее по памяти на CPU, точность чуть ниже)
+            compat (bool): Прежняя поэлементная классификация на словарях, в которой
+                повторяющиеся в группировке классы (sadness) учитываются дважды
+            cache (InferenceCache): Кэш результатов classify (None - без кэша)
+            prediction_cache (PersistentPredictionCache): Персистентный кэш
+                сырых вероятностей, общий для процессов (None - без кэша)
+            token_cache_size (int): Размер LRU-кэша id токенов повторяющихся текстов
+                (0 - без кэша)
+        """
+        if backend not in ('torch', 'onnx', 'stub'):
+            raise ValueError(f'Unknown backend: {backend}')
+        if backend == 'onnx' and (onnx_path is None or quantize):
+            raise ValueError('onnx backend requires onnx_path and does not support quantize')
+
         self.model_path = model_path
-        self.tokenizer, self.model = self._load_model()
+        self.model_dir = model_path if os.path.isdir(model_path) else None
+        self.onnx_path = onnx_path
+        self.dynamic_padding = dynamic_padding
+        self.quantize = quantize
+        self.compat = compat
+        self.cache = cache
+        self.prediction_cache = prediction_cache
+        self.scheduler = None
+        self.token_cache = InferenceCache(token_cache_size) if token_cache_size > 0 else None
+        if backend == 'onnx':
+            self.tokenizer = self._load_tokenizer()
+            self.model = None
+            self.backend = OnnxBackend(onnx_path)
+        elif backend == 'stub':
+            self.tokenizer = StubTokenizer()
+            self.model = None
+            self.backend = StubBackend(len(self.CLASSES))
+        else:
+            self.tokenizer, self.model = self._load_model()
+            self.backend = TorchBackend(self.model)
+        self.fingerprint = self._fingerprint()
+        if self.prediction_cache is not None:
+            self.prediction_cache.prune(self.fingerprint)
+
+    def _load_tokenizer(self):
+        """Загрузка быстрого (Rust) токенизатора - медленный токенизирует пачки поэлементно"""
+        from transformers import AutoTokenizer
+
+        source = self.model_dir or self.MODEL_NAME
+        tokenizer = AutoTokenizer.from_pretrained(source, use_fast=True)
+        if not tokenizer.is_fast:
+            raise RuntimeError(
+                f'Fast tokenizer is not available for {source}, install the tokenizers package'
+            )
+        return tokenizer
 
     def _load_model(self):
         """Загрузка модели и токенизатора"""
-        tokenizer = AutoTokenizer.from_pretrained(self.MODEL_NAME)
-        model = AutoModelForSequenceClassification.from_pretrained(
-            self.MODEL_NAME,
-            num_labels=len(self.CLASSES),
-            problem_type="multi_label_classification"
-        ).to('cpu')
-
-        checkpoint = torch.load(self.model_path, map_location='cpu')
-        if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
-            model.load_state_dict(checkpoint['model_state_dict'])
+        import torch
+        from transformers import AutoModelForSequenceClassification
+
+        tokenizer = self._load_tokenizer()
+        if self.model_dir is not None:
+            # Веса читаются из safetensors через mmap прямо в параметры модели,
+            # без случайной инициализации и второй копии state dict
+            model = AutoModelForSequenceClassification.from_pretrained(
+                self.model_dir,
+                low_cpu_mem_usage=True,
+                use_safetensors=True,
+            )
         else:
-            model.load_state_dict(checkpoint)
+            model = AutoModelForSequenceClassification.from_pretrained(
+                self.MODEL_NAME,
+                num_labels=len(self.CLASSES),
+                problem_type="multi_label_classification"
+            ).to('cpu')
+
+            checkpoint = torch.load(self.model_path, map_location='cpu')
+            if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
+                model.load_state_dict(checkpoint['model_state_dict'])
+            else:
+                model.load_state_dict(checkpoint)
+            del checkpoint
 
         model.eval()
+        if self.quantize:
+            model = torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
         return tokenizer, model
 
-    def _preprocess(self, text):
-        """Предобработка текста"""
-        text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-        text = re.sub(r'<.*?>', '', text)
-        text = text.translate(str.maketrans('', '', string.punctuation))
-        text = text.lower()
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text
+    def _fingerprint(self):
+        """Отпечаток весов модели и режима инференса - участвует в ключах кэша"""
+        digest = hashlib.sha256(self.MODEL_NAME.encode('utf-8'))
+        digest.update(self.backend.name.encode('utf-8'))
+        digest.update(b'int8' if self.quantize else b'fp32')
+        if self.backend.name == 'stub':
+            return digest.hexdigest()
+        if self.backend.name == 'onnx':
+            path = self.onnx_path
+        elif self.model_dir is not None:
+            path = os.path.join(self.model_dir, 'model.safetensors')
+        else:
+            path = self.model_path
+        # Файл весов (~700 МБ) не хэшируется при запуске: используется хэш,
+        # записанный рядом convert_model.py или python -m emotion_classifier
+        # --write-hash, если он не старше весов, иначе - путь, размер и время
+        # изменения файла
+        stat = os.stat(path)
+        hash_path = path + WEIGHTS_HASH_SUFFIX
+        if os.path.exists(hash_path) and os.stat(hash_path).st_mtime_ns >= stat.st_mtime_ns:
+            with open(hash_path) as file:
+                digest.update(file.read().strip().encode('utf-8'))
+        else:
+            digest.update(os.path.abspath(path).encode('utf-8'))
+            digest.update(f'{stat.st_mtime_ns}'.encode('utf-8'))
+        digest.update(f'{stat.st_size}'.encode('utf-8'))
+        return digest.hexdigest()
 
-    def predict_raw(self, text):
+    # Предобработка текста - та же, что при обучении
+    _preprocess = staticmethod(preprocess_text)
+
+    def enable_micro_batching(self, max_batch_size=64, max_wait_ms=10):
+        """Прямые проходы одновременных запросов объединяются в общие пачки"""
+        # Общая пачка идёт в модель одним проходом, без разбиения по BATCH_SIZE
+        self.scheduler = MicroBatchScheduler(
+            functools.partial(self._forward, batch_size=max_batch_size), max_batch_size, max_wait_ms
+        )
+
+    def after_fork(self, threads=None):
         """
-        Возвращает сырой результат предсказания
+        Подготовка экземпляра, унаследованного дочерним процессом при fork
+        Args:
+            threads (int): Количество потоков инференса в процессе
+        """
+        self.backend.after_fork(threads)
+        if self.prediction_cache is not None:
+            self.prediction_cache.after_fork()
+
+    def warmup(self, text='Я люблю писать код!', batch_sizes=None, lengths=None):
+        """
+        Прогон модели в обход кэшей на характерных размерах пачек и длинах
+        последовательностей, чтобы первые запросы не платили за выделение
+        памяти и подготовку ядер под новые формы тензоров
+        Args:
+            batch_sizes (list): Размеры пачек (по умолчанию 1, 8, BATCH_SIZE
+                и размер пачки micro-batching)
+            lengths (list): Длины в токенах (по умолчанию 16, 64, MAX_LEN)
         Returns:
-            dict: {эмоция: вероятность}
+            list: [(размер пачки, длина, мс), ...]
         """
-        encoding = self.tokenizer.encode_plus(
-            self._preprocess(text),
+        if batch_sizes is None:
+            batch_sizes = {1, 8, self.BATCH_SIZE}
+            if self.scheduler is not None:
+                batch_sizes.add(self.scheduler.max_batch_size)
+        if lengths is None:
+            lengths = (16, 64, self.MAX_LEN)
+
+        # Заодно прогревается и токенизатор
+        ids = self.tokenizer(
+            ' '.join([self._preprocess(text)] * self.MAX_LEN),
             add_special_tokens=True,
             max_length=self.MAX_LEN,
-            padding='max_length',
             truncation=True,
-            return_attention_mask=True,
-            return_tensors='pt',
-        )
+        )['input_ids']
+        shapes = []
+        for batch_size in sorted(batch_sizes):
+            for length in sorted(set(min(length, len(ids)) for length in lengths)):
+                encodings = [ids[:length - 1] + ids[-1:]] * batch_size
+                started_at = time.perf_counter()
+                self.backend(*self._pad_batch(encodings, length))
+                shapes.append((batch_size, length, (time.perf_counter() - started_at) * 1000))
+        return shapes
 
-        with torch.no_grad():
-            outputs = self.model(
-                input_ids=encoding['input_ids'],
-                attention_mask=encoding['attention_mask']
-            )
+    def predict_raw(self, text):
+        """
+        Возвращает сырой результат предсказания
+        Returns:
+            dict: {эмоция: вероятность}
+        """
+        return self.predict_raw_batch([text])[0]
 
-        probs = torch.sigmoid(outputs.logits).cpu().numpy()[0]
-        result = {
-            emotion: float(prob) for emotion, prob in zip(self.CLASSES, probs)
-        }
-        return dict(sorted(result.items(), key=lambda pair: -pair[1]))
+    def predict_raw_batch(self, texts, batch_size=None):
+        """
+        Возвращает сырые результаты предсказания для списка текстов.
+        Тексты токенизируются одним вызовом и прогоняются через модель
+        одним прямым проходом на пачку
+        Args:
+            texts (list): Список текстов
+            batch_size (int): Размер пачки (по умолчанию BATCH_SIZE)
+        Returns:
+            list: [{эмоция: вероятность}, ...] в порядке входных текстов
+        """
+        return self._predict_preprocessed(preprocess_batch(texts), batch_size)
+
+    def _predict_preprocessed(self, texts, batch_size=None, timings=None):
+        """predict_raw_batch() для уже предобработанных текстов"""
+        results = []
+        for probs in self._predict_probabilities(texts, batch_size, timings=timings):
+            result = {
+                emotion: float(prob) for emotion, prob in zip(self.CLASSES, probs)
+            }
+            results.append(dict(sorted(result.items(), key=lambda pair: -pair[1])))
+        return results
+
+    def _predict_probabilities(self, texts, batch_size=None, timings=None):
+        """
+        Вероятности классов для предобработанных текстов с учётом
+        персистентного кэша
+        Args:
+            timings (dict): Если передан, в него добавляется время этапов (мс)
+        Returns:
+            numpy.ndarray: (количество текстов, len(CLASSES))
+        """
+        probabilities = [None] * len(texts)
+        if self.prediction_cache is not None:
+            probabilities = self.prediction_cache.get_many(texts, self.fingerprint)
+
+        missing = [i for i, probs in enumerate(probabilities) if probs is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            if self.scheduler is not None:
+                computed = self.scheduler.forward(missing_texts, timings=timings)
+            else:
+                computed = self._forward(missing_texts, batch_size, timings=timings)
+            for i, probs in zip(missing, computed):
+                probabilities[i] = probs
+            if self.prediction_cache is not None:
+                self.prediction_cache.put_many(missing_texts, computed, self.fingerprint)
+
+        return np.array(probabilities, dtype=np.float32).reshape(len(texts), len(self.CLASSES))
+
+    def _forward(self, texts, batch_size=None, timings=None):
+        """
+        Токенизация и прямой проход модели
+        Args:
+            timings (dict): Если передан, в него добавляется время токенизации
+                (tokenize_ms, вместе с паддингом) и модели (model_ms)
+        Returns:
+            list: Векторы вероятностей по CLASSES в порядке входных текстов
+        """
+        if not texts:
+            return []
+        batch_size = batch_size or self.BATCH_SIZE
+        started_at = time.perf_counter()
+        model_time = 0.0
+
+        encodings = self._tokenize(texts)
+
+        order = list(range(len(texts)))
+        if self.dynamic_padding:
+            # Соседние по длине тексты попадают в одну пачку - меньше паддинга
+            order.sort(key=lambda i: len(encodings[i]))
+
+        results = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            batch = [encodings[i] for i in indices]
+            length = max(map(len, batch)) if self.dynamic_padding else self.MAX_LEN
+            input_ids, attention_mask = self._pad_batch(batch, length)
+            MODEL_BATCH_SIZE.observe(len(batch))
+
+            model_started_at = time.perf_counter()
+            probabilities = self.backend(input_ids, attention_mask)
+            model_time += time.perf_counter() - model_started_at
+            for i, probs in zip(indices, probabilities):
+                results[i] = probs
+
+        if timings is not None:
+            total_time = time.perf_counter() - started_at
+            add_timing(timings, 'tokenize_ms', total_time - model_time)
+            add_timing(timings, 'model_ms', model_time)
+        return results
+
+    def _tokenize(self, texts):
+        """id токенов одним вызовом токенизатора, повторяющиеся тексты - из кэша"""
+        encodings = [None] * len(texts)
+        if self.token_cache is not None:
+            encodings = [self.token_cache.get(text) for text in texts]
+        missing = [i for i, ids in enumerate(encodings) if ids is None]
+        if missing:
+            tokenized = self.tokenizer(
+                [texts[i] for i in missing],
+                add_special_tokens=True,
+                max_length=self.MAX_LEN,
+                truncation=True,
+            )['input_ids']
+            for i, ids in zip(missing, tokenized):
+                encodings[i] = ids
+                if self.token_cache is not None:
+                    self.token_cache.put(texts[i], ids)
+        return encodings
+
+    def _pad_batch(self, encodings, length):
+        """Дополнение списков id токенов до общей длины (numpy int64)"""
+        input_ids = np.full((len(encodings), length), self.tokenizer.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), length), dtype=np.int64)
+        for row, ids in enumerate(encodings):
+            input_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
+        return input_ids, attention_mask
 
     # todo: implement
     @staticmethod
@@ -155,10 +446,87 @@ class EmotionClassifier:
             'categories': categories
         }
 
-    def classify(self, text, *, grouping="a", neutral_decrease=0.1):
+    def classify(self, text, *, grouping="a", neutral_decrease=0.1, detail='full', top_k=0):
+        return self.classify_batch(
+            [text], grouping=grouping, neutral_decrease=neutral_decrease, detail=detail, top_k=top_k
+        )[0]
+
+    def classify_batch(self, texts, *, grouping="a", neutral_decrease=0.1, detail='full', top_k=0,
+                       batch_size=None, stats=None):
+        """
+        Пакетная классификация, результаты совпадают с classify() для каждого текста.
+        Одинаковые (после предобработки) тексты классифицируются один раз,
+        уже известные результаты берутся из кэша
+        Args:
+            detail (str): 'full' - с блоком information (все вероятности и оценки),
+                'lean' - только итоговые метки
+            top_k (int): Добавить top_emotions - k самых вероятных исходных классов
+            stats (dict): Если передан, заполняется счётчиками cache_hits,
+                cache_misses, duplicates и временем этапов timings_ms
+        Returns:
+            list: Результаты classify() в порядке входных текстов.
+                Для одинаковых текстов возвращается один и тот же объект
+        """
+        timings = stats.setdefault('timings_ms', {}) if stats is not None else None
+        results = [None] * len(texts)
+        pending = {}  # ключ -> (предобработанный текст, индексы во входном списке)
+        cache_hits = 0
+        started_at = time.perf_counter()
+        processed_all = preprocess_batch(texts)
+        if timings is not None:
+            add_timing(timings, 'preprocess_ms', time.perf_counter() - started_at)
+        for i, processed in enumerate(processed_all):
+            key = InferenceCache.make_key(
+                processed, grouping, neutral_decrease, detail, top_k, self.compat, self.fingerprint
+            )
+            if key in pending:
+                pending[key][1].append(i)
+                continue
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                results[i] = cached
+                cache_hits += 1
+            else:
+                pending[key] = (processed, [i])
+
+        processed_texts = [processed for processed, _ in pending.values()]
+        if self.compat:
+            classified = [
+                self._classify_prediction(prediction, grouping, neutral_decrease)
+                for prediction in self._predict_preprocessed(processed_texts, batch_size, timings)
+            ]
+            for result in classified:
+                if top_k:
+                    result['top_emotions'] = list(result['information']['raw_emotions'].items())[:top_k]
+                if detail != 'full':
+                    del result['information']
+        else:
+            probabilities = self._predict_probabilities(processed_texts, batch_size, timings=timings)
+            started_at = time.perf_counter()
+            classified = self._classify_probabilities(
+                probabilities, grouping, neutral_decrease, detail=detail, top_k=top_k
+            )
+            if timings is not None:
+                add_timing(timings, 'postprocess_ms', time.perf_counter() - started_at)
+        for (key, (_, indices)), result in zip(pending.items(), classified):
+            if self.cache is not None:
+                self.cache.put(key, result)
+            for i in indices:
+                results[i] = result
+
+        if stats is not None:
+            stats['cache_hits'] = cache_hits
+            stats['cache_misses'] = len(pending)
+            stats['duplicates'] = len(texts) - cache_hits - len(pending)
+        return results
 
-        prediction = self.predict_raw(text)
-        selected_grouping = self.GROUPINGS[grouping]
+    @classmethod
+    def _classify_prediction(cls, prediction, grouping, neutral_decrease):
+        """
+        Классификация одного предсказания на словарях (режим совместимости).
+        Классы, повторяющиеся в списке группировки, учитываются повторно
+        """
+        selected_grouping = cls.GROUPINGS[grouping]
 
         emotions = {}
         for emotion, classes in selected_grouping['emotions'].items():
@@ -219,3 +587,143 @@ class EmotionClassifier:
             )
 
         return result
+
+    @classmethod
+    def _compiled_grouping(cls, grouping):
+        """
+        Матрицы проекции вероятностей CLASSES на эмоции и тональности группировки.
+        Каждый класс входит в группу не более одного раза
+        Returns:
+            dict: {'emotions': (названия, матрица), 'sentiments': (названия, матрица)}
+        """
+        compiled = cls._compiled_groupings.get(grouping)
+        if compiled is None:
+            class_index = {name: i for i, name in enumerate(cls.CLASSES)}
+            compiled = {}
+            for part, groups in cls.GROUPINGS[grouping].items():
+                matrix = np.zeros((len(cls.CLASSES), len(groups)), dtype=np.float64)
+                for column, classes in enumerate(groups.values()):
+                    matrix[[class_index[c] for c in set(classes)], column] = 1
+                compiled[part] = (list(groups), matrix)
+            cls._compiled_groupings[grouping] = compiled
+        return compiled
+
+    @classmethod
+    def _classify_probabilities(cls, probabilities, grouping, neutral_decrease, detail='full', top_k=0):
+        """
+        Векторизованная классификация пачки: оценки эмоций и тональностей
+        считаются одним матричным умножением, поправки - операциями над массивами
+        Args:
+            probabilities (numpy.ndarray): (количество текстов, len(CLASSES))
+            detail (str), top_k (int): См. classify_batch()
+        Returns:
+            list: Результаты в формате classify()
+        """
+        compiled = cls._compiled_grouping(grouping)
+        emotion_names, emotion_matrix = compiled['emotions']
+        sentiment_names, sentiment_matrix = compiled['sentiments']
+        emotion_index = {name: i for i, name in enumerate(emotion_names)}
+        sentiment_index = {name: i for i, name in enumerate(sentiment_names)}
+
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        emotion_scores = probabilities @ emotion_matrix
+        sentiment_scores = probabilities @ sentiment_matrix
+
+        # Устойчивая сортировка - при равенстве порядок как в группировке
+        emotion_order = np.argsort(-emotion_scores, axis=1, kind='stable')
+        sentiment_order = np.argsort(-sentiment_scores, axis=1, kind='stable')
+        if detail == 'full':
+            raw_order = np.argsort(-probabilities, axis=1, kind='stable')
+        elif top_k:
+            raw_order = np.argsort(-probabilities, axis=1, kind='stable')[:, :top_k]
+        else:
+            raw_order = probabilities.argmax(axis=1)[:, None]
+        emotion_top = np.take_along_axis(emotion_scores, emotion_order[:, :3], axis=1)
+        sentiment_top = np.take_along_axis(sentiment_scores, sentiment_order[:, :3], axis=1)
+
+        emotion = emotion_order[:, 0].copy()
+        sentiment = sentiment_order[:, 0].copy()
+        neutral_emotion = emotion_index['neutral']
+        neutral_sentiment = sentiment_index['neutral']
+
+        emotion_decrease = (emotion == neutral_emotion) \
+            & (emotion_top[:, 0] - emotion_top[:, 1] <= neutral_decrease) \
+            & (emotion_top[:, 0] - emotion_top[:, 2] > neutral_decrease * 2)
+        sentiment_close = sentiment_top[:, 0] - sentiment_top[:, 1] <= neutral_decrease
+        sentiment_decrease = (sentiment == neutral_sentiment) & sentiment_close \
+            & (sentiment_top[:, 0] - sentiment_top[:, 2] > neutral_decrease * 2)
+        sentiment_controversial = (sentiment != neutral_sentiment) & sentiment_close \
+            & (sentiment_top[:, 1] - sentiment_top[:, 2] <= neutral_decrease)
+
+        emotion[emotion_decrease] = emotion_order[emotion_decrease, 1]
+        sentiment[sentiment_decrease] = sentiment_order[sentiment_decrease, 1]
+        sentiment[sentiment_controversial] = neutral_sentiment
+
+        # Эмоция противоречит тональности
+        negative_emotions = [emotion_index[e] for e in ('anger', 'sadness', 'fear') if e in emotion_index]
+        conflict = ((sentiment == sentiment_index.get('negative', -1)) & (emotion == emotion_index.get('joy', -1))) \
+            | ((sentiment == sentiment_index.get('positive', -1)) & np.isin(emotion, negative_emotions))
+        sentiment[conflict] = neutral_sentiment
+
+        emotion_labels = [emotion_names[i] for i in emotion]
+        sentiment_labels = [sentiment_names[i] for i in sentiment]
+        raw_labels = [cls.CLASSES[i] for i in raw_order[:, 0]]
+        if detail != 'full':
+            results = [
+                {'emotion': emotion_label, 'sentiment': sentiment_label, 'raw_emotion': raw_label}
+                for emotion_label, sentiment_label, raw_label in zip(emotion_labels, sentiment_labels, raw_labels)
+            ]
+            if top_k:
+                for row, result in enumerate(results):
+                    result['top_emotions'] = [
+                        (cls.CLASSES[i], float(probabilities[row, i])) for i in raw_order[row]
+                    ]
+            return results
+
+        results = []
+        for row in range(len(probabilities)):
+            correction = []
+            if emotion_decrease[row]:
+                correction.append(f'neutral-decrease-emotion-{neutral_decrease:.3f}')
+            if sentiment_decrease[row]:
+                correction.append(f'neutral-decrease-sentiment-{neutral_decrease:.3f}')
+            elif sentiment_controversial[row]:
+                correction.append(f'sentiment-controversial-{neutral_decrease:.3f}')
+            if conflict[row]:
+                correction.append(f'neutral-{emotion_names[emotion[row]]}')
+
+            result = {
+                'emotion': emotion_labels[row],
+                'sentiment': sentiment_labels[row],
+                'raw_emotion': raw_labels[row],
+                'information': {
+                    'emotions': {
+                        emotion_names[i]: float(emotion_scores[row, i]) for i in emotion_order[row]
+                    },
+                    'sentiments': {
+                        sentiment_names[i]: float(sentiment_scores[row, i]) for i in sentiment_order[row]
+                    },
+                    'raw_emotions': {
+                        cls.CLASSES[i]: float(probabilities[row, i]) for i in raw_order[row]
+                    },
+                    'correction': correction,
+                }
+            }
+            if top_k:
+                result['top_emotions'] = [
+                    (cls.CLASSES[i], float(probabilities[row, i])) for i in raw_order[row, :top_k]
+                ]
+            results.append(result)
+        return results
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--write-hash', metavar='PATH', nargs='+', required=True,
+                        help='Файлы весов (.pth, .safetensors), для которых записать хэш')
+    args = parser.parse_args()
+    for weights_path in args.write_hash:
+        write_weights_hash(weights_path)
+        print(f'{weights_path}{WEIGHTS_HASH_SUFFIX}')
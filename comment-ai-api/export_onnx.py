@@ -0,0 +1,78 @@
+"""
+Экспорт дообученной модели в ONNX (динамические оси batch и sequence)
+и сверка выходов onnxruntime с PyTorch.
+Запуск:
+    python export_onnx.py --model ./model/trained/model.pth --output ./model/trained/model.onnx
+"""
+import argparse
+import sys
+
+import numpy as np
+import torch
+
+from emotion_classifier import EmotionClassifier
+from benchmarks.corpus import generate_corpus
+
+
+class LogitsOnly(torch.nn.Module):
+    """Обёртка, оставляющая у модели единственный выход - logits"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+
+def export(classifier, output_path, opset):
+    sample = classifier.tokenizer(
+        ['Я люблю писать код!', 'Спасибо'],
+        padding=True,
+        return_tensors='pt',
+    )
+    torch.onnx.export(
+        LogitsOnly(classifier.model).eval(),
+        (sample['input_ids'], sample['attention_mask']),
+        output_path,
+        input_names=['input_ids', 'attention_mask'],
+        output_names=['logits'],
+        dynamic_axes={
+            'input_ids': {0: 'batch', 1: 'sequence'},
+            'attention_mask': {0: 'batch', 1: 'sequence'},
+            'logits': {0: 'batch'},
+        },
+        opset_version=opset,
+        dynamo=False,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='./model/trained/model.pth')
+    parser.add_argument('--output', default='./model/trained/model.onnx')
+    parser.add_argument('--opset', type=int, default=17)
+    parser.add_argument('--check-size', type=int, default=256, help='Количество текстов для сверки')
+    parser.add_argument('--tolerance', type=float, default=1e-4)
+    args = parser.parse_args()
+
+    torch_classifier = EmotionClassifier(args.model, dynamic_padding=True)
+    export(torch_classifier, args.output, args.opset)
+    print(f'Exported to {args.output}')
+
+    onnx_classifier = EmotionClassifier(
+        args.model, backend='onnx', onnx_path=args.output, dynamic_padding=True
+    )
+    texts = [torch_classifier._preprocess(text) for text in generate_corpus(args.check_size)]
+    expected = np.array(torch_classifier._forward(texts))
+    actual = np.array(onnx_classifier._forward(texts))
+    max_diff = float(np.abs(expected - actual).max())
+    same_top = int((expected.argmax(axis=1) == actual.argmax(axis=1)).sum())
+    print(f'max_prob_diff={max_diff:.2e} same_top_class={same_top}/{len(texts)}')
+    if max_diff > args.tolerance:
+        print(f'Difference exceeds tolerance {args.tolerance}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import zlib
+
+import numpy as np
+
+
+class TorchBackend:
+    """Инференс модели средствами PyTorch"""
+
+    name = 'torch'
+
+    def __init__(self, model):
+        self.model = model
+
+    def after_fork(self, threads=None):
+        import torch
+
+        # Веса остаются общими с родительским процессом (copy-on-write)
+        if threads:
+            torch.set_num_threads(threads)
+
+    def __call__(self, input_ids, attention_mask):
+        """
+        Args:
+            input_ids, attention_mask (numpy.ndarray): (batch, длина), int64
+        Returns:
+            numpy.ndarray: Вероятности классов, (batch, классы)
+        """
+        import torch
+
+        with torch.no_grad():
+            outputs = self.model(
+                input_ids=torch.from_numpy(input_ids),
+                attention_mask=torch.from_numpy(attention_mask)
+            )
+        return torch.sigmoid(outputs.logits).cpu().numpy()
+
+
+class OnnxBackend:
+    """Инференс экспортированной модели (export_onnx.py) через onnxruntime на CPU"""
+
+    name = 'onnx'
+
+    def __init__(self, path, intra_op_threads=None):
+        self.path = path
+        self.session = self._create_session(intra_op_threads)
+
+    def _create_session(self, intra_op_threads):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        return onnxruntime.InferenceSession(
+            self.path, options, providers=['CPUExecutionProvider']
+        )
+
+    def after_fork(self, threads=None):
+        # Пул потоков onnxruntime не переживает fork - сессия создаётся заново
+        self.session = self._create_session(threads)
+
+    def __call__(self, input_ids, attention_mask):
+        logits, = self.session.run(['logits'], {
+            'input_ids': input_ids,
+            'attention_mask': attention_mask,
+        })
+        return 1 / (1 + np.exp(-logits))
+
+
+class StubTokenizer:
+    """
+    Замена токенизатора для backend='stub': слова хэшируются в id без
+    загрузки словаря, форма результата - как у токенизатора transformers
+    """
+
+    is_fast = True
+    pad_token_id = 0
+    cls_token_id = 101
+    sep_token_id = 102
+    vocab_size = 30000
+
+    def _encode(self, text, add_special_tokens, max_length, truncation):
+        ids = [103 + zlib.crc32(word.encode('utf-8')) % (self.vocab_size - 103) for word in text.split()]
+        if add_special_tokens:
+            ids = [self.cls_token_id] + ids + [self.sep_token_id]
+        if truncation and max_length is not None and len(ids) > max_length:
+            ids = ids[:max_length - 1] + ids[-1:] if add_special_tokens else ids[:max_length]
+        return ids
+
+    def __call__(self, texts, add_special_tokens=True, max_length=None, truncation=False):
+        if isinstance(texts, str):
+            return {'input_ids': self._encode(texts, add_special_tokens, max_length, truncation)}
+        return {'input_ids': [
+            self._encode(text, add_special_tokens, max_length, truncation) for text in texts
+        ]}
+
+
+class StubBackend:
+    """
+    Детерминированные псевдовероятности вместо модели - для замеров
+    HTTP-слоя, предобработки и сериализации без затрат на инференс
+    """
+
+    name = 'stub'
+
+    def __init__(self, num_classes):
+        # Разные множители для классов, чтобы победитель зависел от текста
+        self.weights = np.arange(1, num_classes + 1, dtype=np.int64) * 7919
+
+    def after_fork(self, threads=None):
+        pass
+
+    def __call__(self, input_ids, attention_mask):
+        seeds = (input_ids * attention_mask).sum(axis=1, keepdims=True)
+        return ((seeds * self.weights) % 1000 / 1000).astype(np.float32)
@@ -0,0 +1,209 @@
+from array import array
+from collections import OrderedDict
+import hashlib
+import sqlite3
+import threading
+import time
+
+
+class InferenceCache:
+    """
+    Ограниченный in-process кэш результатов классификации.
+    Вытеснение по LRU и, опционально, по времени жизни записи (TTL)
+    """
+
+    def __init__(self, max_size=10000, ttl=None, clock=time.monotonic):
+        """
+        Args:
+            max_size (int): Максимальное количество записей
+            ttl (float): Время жизни записи в секундах (None - без ограничения)
+            clock (callable): Источник времени (для тестов)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(*parts):
+        """Ключ кэша - хэш от всех частей (текст, группировка, параметры, модель)"""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(str(part).encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Возвращает сохранённое значение или None"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at is None or expires_at > self._clock():
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._items[key]
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            expires_at = None if self.ttl is None else self._clock() + self.ttl
+            self._items[key] = (expires_at, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'size': len(self._items),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / requests, 4) if requests else 0.0,
+            }
+
+
+class PersistentPredictionCache:
+    """
+    Персистентный кэш сырых вероятностей модели в SQLite.
+    Переживает перезапуски и доступен нескольким процессам одновременно
+    (режим WAL: читатели не блокируют друг друга и писателя).
+    Записи привязаны к отпечатку модели: записи других моделей не
+    используются и удаляются, когда им больше stale_after секунд (во время
+    постепенного обновления старые и новые воркеры не стирают записи друг
+    друга). Ограничение max_rows соблюдается при записи: раз в trim_every
+    (но не реже, чем раз в max_rows) записанных строк удаляются самые старые
+    записи сверх него, так что в базе не больше ~2 * max_rows записей на процесс
+    """
+
+    def __init__(self, path, max_rows=None, trim_every=1000, stale_after=3600, clock=time.time):
+        """
+        Args:
+            path (str): Путь к файлу базы
+            max_rows (int): Ограничение количества записей (None - без ограничения)
+            trim_every (int): Через сколько записанных строк проверяются ограничения
+                (при max_rows - не больше max_rows)
+            stale_after (float): Через сколько секунд удаляются записи других моделей
+            clock (callable): Источник времени (для тестов)
+        """
+        self.path = path
+        self.max_rows = max_rows
+        self.trim_every = min(trim_every, max_rows) if max_rows else trim_every
+        self.stale_after = stale_after
+        self._clock = clock
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._written = 0
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS predictions ('
+                ' text_hash TEXT NOT NULL,'
+                ' model TEXT NOT NULL,'
+                ' probs BLOB NOT NULL,'
+                ' created_at REAL NOT NULL,'
+                ' PRIMARY KEY (text_hash, model)'
+                ') WITHOUT ROWID'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS predictions_created_at ON predictions (created_at)'
+            )
+
+    def prune(self, fingerprint):
+        """
+        Удаление устаревших записей других моделей и самых старых записей
+        сверх max_rows
+        """
+        with self._connection() as connection:
+            connection.execute(
+                'DELETE FROM predictions WHERE model != ? AND created_at < ?',
+                (fingerprint, self._clock() - self.stale_after)
+            )
+            if self.max_rows is not None:
+                connection.execute(
+                    'DELETE FROM predictions WHERE (text_hash, model) IN ('
+                    ' SELECT text_hash, model FROM predictions ORDER BY created_at DESC LIMIT -1 OFFSET ?'
+                    ')',
+                    (self.max_rows,)
+                )
+
+    def _connection(self):
+        """Отдельное соединение на поток - sqlite3 не разделяет их между потоками"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def after_fork(self):
+        """Соединения SQLite нельзя использовать в дочернем процессе после fork"""
+        self._local = threading.local()
+
+    @staticmethod
+    def _hash(text):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get_many(self, texts, fingerprint):
+        """
+        Returns:
+            list: Векторы вероятностей (или None для отсутствующих) в порядке texts
+        """
+        hashes = [self._hash(text) for text in texts]
+        found = {}
+        connection = self._connection()
+        # Ограничение SQLite на количество параметров запроса
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            rows = connection.execute(
+                f'SELECT text_hash, probs FROM predictions '
+                f'WHERE model = ? AND text_hash IN ({",".join("?" * len(chunk))})',
+                (fingerprint, *chunk)
+            )
+            for text_hash, probs in rows:
+                found[text_hash] = array('f', probs)
+        return [found.get(text_hash) for text_hash in hashes]
+
+    def put_many(self, texts, probabilities, fingerprint):
+        now = self._clock()
+        rows = [
+            (self._hash(text), fingerprint, array('f', map(float, probs)).tobytes(), now)
+            for text, probs in zip(texts, probabilities)
+        ]
+        with self._connection() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO predictions (text_hash, model, probs, created_at) '
+                'VALUES (?, ?, ?, ?)',
+                rows
+            )
+
+        with self._lock:
+            self._written += len(rows)
+            trim = self._written >= self.trim_every
+            if trim:
+                self._written = 0
+        if trim:
+            self.prune(fingerprint)
+
+    def stats(self):
+        count, = self._connection().execute('SELECT COUNT(*) FROM predictions').fetchone()
+        return {'path': self.path, 'size': count}
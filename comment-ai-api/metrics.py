@@ -0,0 +1,170 @@
+import math
+import os
+import threading
+
+# Границы корзин по умолчанию (секунды) - от 1 мс до 30 с
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Registry:
+    """Набор метрик, отдаваемых одним ответом в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        return ''.join(metric.render() for metric in metrics)
+
+
+REGISTRY = Registry()
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY, function=None):
+        """
+        Args:
+            name (str): Имя метрики
+            documentation (str): Описание (строка HELP)
+            labelnames (tuple): Имена меток; значения передаются именованными
+                аргументами в inc/set/observe
+            registry (Registry): Куда зарегистрировать метрику (None - никуда)
+            function (callable): Источник значения, опрашиваемый при каждом
+                чтении метрик вместо inc/set. Для метрики с метками возвращает
+                словарь {кортеж значений меток: значение}; None - пропустить
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._function = function
+        self._values = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _label_values(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """Список (суффикс имени, метки, значение)"""
+        if self._function is not None:
+            values = self._function()
+            if not self.labelnames:
+                values = {(): values}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [
+            ('', dict(zip(self.labelnames, label_values)), value)
+            for label_values, value in values.items()
+            if value is not None
+        ]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        for suffix, labels, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class Counter(_Metric):
+    """Монотонно растущий счётчик"""
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Текущее значение"""
+
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Распределение значений по накопительным корзинам (le) с суммой и количеством"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for label_values, (counts, total, count) in self._values.items():
+                labels = dict(zip(self.labelnames, label_values))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    samples.append(('_bucket', {**labels, 'le': _format_value(bound)}, cumulative))
+                samples.append(('_sum', labels, total))
+                samples.append(('_count', labels, count))
+        return samples
+
+
+def process_stats():
+    """RSS (байты) и количество потоков ОС текущего процесса"""
+    stats = {'rss_bytes': None, 'threads': threading.active_count()}
+    try:
+        with open(f'/proc/{os.getpid()}/status') as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    stats['rss_bytes'] = int(line.split()[1]) * 1024
+                elif line.startswith('Threads:'):
+                    stats['threads'] = int(line.split()[1])
+    except OSError:
+        # Не Linux: RSS недоступен, потоки - только потоки Python
+        pass
+    return stats
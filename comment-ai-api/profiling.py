@@ -0,0 +1,64 @@
+from contextlib import contextmanager
+import os
+import threading
+import time
+import uuid
+
+PROFILERS = ('cprofile', 'torch')
+
+# torch.profiler - глобальный для процесса, одновременно работает только одна сессия
+_torch_profiler_lock = threading.Lock()
+
+
+class RequestProfiler:
+    """
+    Запись трасс отдельных запросов в каталог: cProfile (.prof, открывается
+    snakeviz или pstats) или torch.profiler (.json, chrome://tracing)
+    """
+
+    def __init__(self, directory, profiler='cprofile'):
+        """
+        Args:
+            directory (str): Каталог для трасс
+            profiler (str): 'cprofile' или 'torch'
+        """
+        if profiler not in PROFILERS:
+            raise ValueError(f'Unknown profiler: {profiler}')
+        self.directory = directory
+        self.profiler = profiler
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name, extension):
+        filename = f'{time.strftime("%Y%m%d-%H%M%S")}-{name}-{uuid.uuid4().hex[:8]}.{extension}'
+        return os.path.join(self.directory, filename)
+
+    @contextmanager
+    def trace(self, name):
+        """
+        Профилирование блока кода. cProfile видит только текущий поток, поэтому
+        при micro-batching прямой проход модели в трассу не попадает
+        Returns:
+            dict: {'path': путь к трассе}, заполняется после выхода из блока
+        """
+        result = {'path': None}
+        if self.profiler == 'torch':
+            import torch
+
+            with _torch_profiler_lock:
+                with torch.profiler.profile(
+                    activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True
+                ) as profiler:
+                    yield result
+                result['path'] = self._path(name, 'json')
+                profiler.export_chrome_trace(result['path'])
+        else:
+            import cProfile
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield result
+            finally:
+                profiler.disable()
+            result['path'] = self._path(name, 'prof')
+            profiler.dump_stats(result['path'])
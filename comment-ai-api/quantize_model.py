@@ -0,0 +1,130 @@
+"""
+Сравнение fp32-модели с динамически квантованной (int8) версией.
+Квантование выполняется при загрузке EmotionClassifier(quantize=True)
+(переменная QUANTIZE в .env), скрипт показывает, чего оно стоит:
+совпадение меток на контрольных примерах из test_model_pytest.py и на
+валидационной выборке, точность относительно разметки, скорость и размер модели.
+Валидационная выборка - та же, что в train/train_raw.py: CSV из
+Config.DATASET_PATHS в том же порядке, то же разбиение train_test_split
+(test_size=0.2, random_state=42) и те же метки; примеры из обучающей
+части в сравнение не попадают.
+Запуск:
+    python quantize_model.py --datasets ./train/translated1.csv ./train/translated2.csv ./train/translated3.csv --limit 2000
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+from sklearn.model_selection import train_test_split
+
+from emotion_classifier import EmotionClassifier
+from train.labels import multi_hot_labels
+
+# Те же примеры, что и в test_model_pytest.py
+REFERENCE_CASES = [
+    ('positive', 'joy', 'Я тебя люблю'),
+    ('negative', 'anger', 'Я тебя ненавижу'),
+    ('negative', 'fear', 'Мне стало страшно'),
+    ('negative', 'sadness', 'Это очень печально'),
+    ('negative', 'sadness', 'Я расплакалась'),
+    ('neutral', 'surprise', 'Не думал, что такое возможно. Очень интересно'),
+    ('neutral', 'neutral', 'Земля вращается вокруг Солнца'),
+]
+
+
+def model_size_mb(model):
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 2 ** 20
+
+
+def load_validation(paths, limit):
+    """
+    Тексты и multi-hot разметка валидационной части train_raw: те же
+    фильтрация, метки (неясные примеры - neutral) и разбиение, что в
+    train_raw.load_and_prepare_data и create_data_loaders
+    Args:
+        paths (list): Config.DATASET_PATHS из train_raw в том же порядке
+        limit (int): Случайное подмножество валидационной части (0 - вся)
+    """
+    df = pd.concat([pd.read_csv(path) for path in paths], ignore_index=True)
+    df = df[df['translated_text'].notna()]
+    labels = multi_hot_labels(df, EmotionClassifier.CLASSES).astype(np.float32)
+
+    _, val_indices = train_test_split(np.arange(len(df)), test_size=0.2, random_state=42)
+    if limit and len(val_indices) > limit:
+        val_indices = np.random.default_rng(42).choice(val_indices, size=limit, replace=False)
+    return df['translated_text'].iloc[val_indices].tolist(), labels[val_indices]
+
+
+def evaluate(classifier, texts, labels, batch_size):
+    start = time.perf_counter()
+    predictions = classifier.predict_raw_batch(texts, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+
+    probs = np.array([[p[c] for c in classifier.CLASSES] for p in predictions])
+    classified = classifier._classify_probabilities(probs, 'a', 0.1)
+    return {
+        'probs': probs,
+        'emotions': [r['emotion'] for r in classified],
+        'sentiments': [r['sentiment'] for r in classified],
+        'throughput': len(texts) / elapsed,
+        # Та же метрика, что multi_label_accuracy при обучении
+        'accuracy': float(((probs > 0.5) == (labels > 0.5)).mean()) if labels is not None else None,
+        # Самый вероятный класс входит в разметку
+        'top1': float(labels[np.arange(len(texts)), probs.argmax(axis=1)].mean()) if labels is not None else None,
+    }
+
+
+def report(name, texts, fp32, int8):
+    emotions_same = np.mean([a == b for a, b in zip(fp32['emotions'], int8['emotions'])])
+    sentiments_same = np.mean([a == b for a, b in zip(fp32['sentiments'], int8['sentiments'])])
+    diff = np.abs(fp32['probs'] - int8['probs'])
+    print(f'\n{name} ({len(texts)} texts)')
+    print(f'  emotion agreement:   {emotions_same:.2%}')
+    print(f'  sentiment agreement: {sentiments_same:.2%}')
+    print(f'  prob diff: mean={diff.mean():.4f} max={diff.max():.4f}')
+    print(f'  throughput: fp32={fp32["throughput"]:.1f}/s int8={int8["throughput"]:.1f}/s '
+          f'({int8["throughput"] / fp32["throughput"]:.2f}x)')
+    if fp32['accuracy'] is not None:
+        print(f'  accuracy@0.5: fp32={fp32["accuracy"]:.4f} int8={int8["accuracy"]:.4f} '
+              f'(delta={int8["accuracy"] - fp32["accuracy"]:+.4f})')
+        print(f'  top-1 in labels: fp32={fp32["top1"]:.4f} int8={int8["top1"]:.4f} '
+              f'(delta={int8["top1"] - fp32["top1"]:+.4f})')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='./model/trained/model.pth')
+    parser.add_argument('--datasets', nargs='*', default=[],
+                        help='CSV обучения train_raw (Config.DATASET_PATHS, в том же порядке)')
+    parser.add_argument('--limit', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=EmotionClassifier.BATCH_SIZE)
+    args = parser.parse_args()
+
+    fp32_classifier = EmotionClassifier(args.model, dynamic_padding=True)
+    int8_classifier = EmotionClassifier(args.model, dynamic_padding=True, quantize=True)
+    print(f'model size: fp32={model_size_mb(fp32_classifier.model):.1f}MB '
+          f'int8={model_size_mb(int8_classifier.model):.1f}MB')
+
+    texts = [text for _, _, text in REFERENCE_CASES]
+    fp32 = evaluate(fp32_classifier, texts, None, args.batch_size)
+    int8 = evaluate(int8_classifier, texts, None, args.batch_size)
+    report('reference cases', texts, fp32, int8)
+    for (sentiment, emotion, text), *labels in zip(
+            REFERENCE_CASES, zip(fp32['sentiments'], fp32['emotions']), zip(int8['sentiments'], int8['emotions'])):
+        marks = ['ok' if label == (sentiment, emotion) else f'{label[0]}/{label[1]}' for label in labels]
+        print(f'  fp32={marks[0]:<18} int8={marks[1]:<18} "{text}"')
+
+    if args.datasets:
+        texts, labels = load_validation(args.datasets, args.limit)
+        fp32 = evaluate(fp32_classifier, texts, labels, args.batch_size)
+        int8 = evaluate(int8_classifier, texts, labels, args.batch_size)
+        report('validation split', texts, fp32, int8)
+
+
+if __name__ == '__main__':
+    main()
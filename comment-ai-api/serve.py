@@ -0,0 +1,83 @@
+"""
+Production-запуск сервиса: модель загружается один раз в master-процессе,
+после чего gunicorn форкает воркеры, разделяющие веса по copy-on-write.
+Каждому воркеру задаётся своё количество потоков инференса, чтобы
+воркеры не конкурировали за ядра.
+Запуск:
+    python serve.py --workers 4 --threads-per-worker 2
+Параметры по умолчанию берутся из .env или переменных окружения
+(WORKERS, THREADS_PER_WORKER, HTTP_THREADS, PORT)
+"""
+import argparse
+import gc
+import os
+
+from dotenv import dotenv_values
+from gunicorn.app.base import BaseApplication
+
+# Переменные окружения процесса переопределяют значения из .env
+CONFIG = {**dotenv_values(".env"), **os.environ}
+
+# Токенизатор создаётся в master-процессе до fork, а используется в воркерах:
+# пул потоков tokenizers не переживает fork
+os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
+
+class ProductionServer(BaseApplication):
+
+    def __init__(self, options, threads_per_worker):
+        self.options = options
+        self.threads_per_worker = threads_per_worker
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+        self.cfg.set('pre_fork', self.pre_fork)
+        self.cfg.set('post_fork', self.post_fork)
+
+    def load(self):
+        # При preload_app вызывается в master-процессе до запуска воркеров
+        from app import app
+        return app
+
+    @staticmethod
+    def pre_fork(server, worker):
+        # Объекты, созданные до fork, исключаются из сборки мусора: иначе
+        # проходы GC в воркерах трогают их заголовки и копируют страницы памяти
+        gc.freeze()
+
+    def post_fork(self, server, worker):
+        from app import emotion_classifier, start_warmup
+        emotion_classifier.after_fork(self.threads_per_worker)
+        # Прогрев - в каждом воркере: пулы потоков и аллокатор у процессов свои
+        start_warmup()
+        server.log.info(
+            f'Worker {worker.pid}: {self.threads_per_worker} inference thread(s)'
+        )
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=int(CONFIG.get('WORKERS') or cpu_count))
+    parser.add_argument('--threads-per-worker', type=int, default=int(CONFIG.get('THREADS_PER_WORKER') or 0))
+    parser.add_argument('--http-threads', type=int, default=int(CONFIG.get('HTTP_THREADS') or 4))
+    parser.add_argument('--port', type=int, default=int(CONFIG.get('PORT') or 5000))
+    parser.add_argument('--host', default=CONFIG.get('HOST') or '0.0.0.0')
+    args = parser.parse_args()
+
+    threads_per_worker = args.threads_per_worker or max(1, cpu_count // args.workers)
+    ProductionServer({
+        'bind': f'{args.host}:{args.port}',
+        'workers': args.workers,
+        # Потоки для одновременных HTTP-запросов - нужны для micro-batching
+        'worker_class': 'gthread',
+        'threads': args.http_threads,
+        'preload_app': True,
+        'timeout': 300,
+    }, threads_per_worker).run()
+
+
+if __name__ == '__main__':
+    main()
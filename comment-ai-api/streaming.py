@@ -0,0 +1,124 @@
+import codecs
+import json
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+class _JsonStreamReader:
+    """Посимвольное чтение JSON из потока байтов без загрузки его целиком"""
+
+    def __init__(self, stream, chunk_size=64 * 1024):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """Дочитывает порцию потока, возвращает False в конце потока"""
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(chunk, final=not chunk)
+        self.pos = 0
+        self.eof = not chunk
+        return True
+
+    def peek(self):
+        """Следующий значимый символ ('' в конце потока)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def next_char(self):
+        char = self.peek()
+        self.pos += 1
+        return char
+
+    def expect(self, char):
+        actual = self.next_char()
+        if actual != char:
+            raise ValueError(f'Expected {char!r}, got {actual!r}')
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # Число в конце буфера может продолжаться в следующей порции
+            if end == len(self.buffer) and not self.eof \
+                    and isinstance(value, (int, float)) and not isinstance(value, bool):
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_comments(stream):
+    """
+    Комментарии из тела вида {"comments": [{...}, ...]} по мере чтения потока
+    """
+    reader = _JsonStreamReader(stream)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key == 'comments':
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.next_char()
+            else:
+                while True:
+                    yield reader.value()
+                    separator = reader.next_char()
+                    if separator == ']':
+                        break
+                    if separator != ',':
+                        raise ValueError(f'Expected \',\' or \']\', got {separator!r}')
+        else:
+            reader.value()
+        separator = reader.next_char()
+        if separator == '}':
+            return
+        if separator != ',':
+            raise ValueError(f'Expected \',\' or \'}}\', got {separator!r}')
+
+
+def iter_ndjson_comments(stream, chunk_size=64 * 1024):
+    """Комментарии из тела в формате NDJSON - по объекту на строку"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    rest = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        rest += decoder.decode(chunk, final=not chunk)
+        *lines, rest = rest.split('\n')
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+        if not chunk:
+            break
+    if rest.strip():
+        yield json.loads(rest)
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
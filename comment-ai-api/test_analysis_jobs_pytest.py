@@ -0,0 +1,116 @@
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import pytest
+import analysis_jobs
+from analysis_jobs import AnalysisJobs, JobQueueFull
+
+
+def process(comments):
+    return [{'id': comment['id'], 'length': len(comment['text'])} for comment in comments]
+
+
+def wait_for(jobs, job_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get(job_id)
+        if job['status'] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f'job {job_id} is {job["status"]}, expected {status}')
+
+
+def test_job_lifecycle_and_pagination(tmp_path):
+    jobs = AnalysisJobs(str(tmp_path / 'jobs.db'), process, chunk_size=2)
+    comments = [{'id': str(i), 'text': 'a' * i} for i in range(5)]
+    job_id = jobs.submit(comments)
+    assert jobs.get(job_id)['status'] in ('queued', 'running', 'done')
+
+    job = wait_for(jobs, job_id, 'done')
+    assert (job['total'], job['done'], job['progress']) == (5, 5, 1.0)
+    assert job['results'] == process(comments)
+    assert job['next_offset'] is None
+
+    page = jobs.get(job_id, offset=2, limit=2)
+    assert [result['id'] for result in page['results']] == ['2', '3']
+    assert page['next_offset'] == 4
+    last_page = jobs.get(job_id, offset=4, limit=2)
+    assert [result['id'] for result in last_page['results']] == ['4']
+    assert last_page['next_offset'] is None
+    assert jobs.get('missing') is None
+
+
+def test_full_queue_rejects_job(tmp_path):
+    release = threading.Event()
+
+    def blocking_process(comments):
+        release.wait(5)
+        return process(comments)
+
+    path = str(tmp_path / 'jobs.db')
+    jobs = AnalysisJobs(path, blocking_process, workers=1, max_queue=1)
+    running = jobs.submit([{'id': '1', 'text': 'a'}])
+    wait_for(jobs, running, 'running')
+    queued = jobs.submit([{'id': '2', 'text': 'b'}])
+    with pytest.raises(JobQueueFull):
+        jobs.submit([{'id': '3', 'text': 'c'}])
+    # Отклонённое задание не остаётся в базе
+    with sqlite3.connect(path) as connection:
+        assert connection.execute('SELECT COUNT(*) FROM jobs').fetchone() == (2,)
+
+    release.set()
+    wait_for(jobs, queued, 'done')
+
+
+def test_finished_jobs_expire(tmp_path):
+    jobs = AnalysisJobs(str(tmp_path / 'jobs.db'), process, ttl=0.05)
+    job_id = jobs.submit([{'id': '1', 'text': 'a'}])
+    wait_for(jobs, job_id, 'done')
+    time.sleep(0.1)
+    # Просроченные задания удаляются при постановке следующего
+    jobs.submit([{'id': '2', 'text': 'b'}])
+    assert jobs.get(job_id) is None
+
+
+def test_jobs_of_exited_process_are_failed(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    release = threading.Event()
+    jobs = AnalysisJobs(path, lambda comments: release.wait(5) and process(comments), workers=1)
+    job_id = jobs.submit([{'id': '1', 'text': 'a'}])
+    wait_for(jobs, job_id, 'running')
+
+    # Задание принадлежит процессу, который уже завершился
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            'UPDATE jobs SET owner = ? WHERE id = ?', (f'{analysis_jobs._host_id()}:{exited.pid}', job_id)
+        )
+
+    job = AnalysisJobs(path, process).get(job_id)
+    assert job['status'] == 'failed'
+    assert 'exited' in job['error']
+    release.set()
+
+
+def test_jobs_of_other_hosts_fail_only_when_stale(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    jobs = AnalysisJobs(path, process, stale_after=60)
+    job_id = jobs.submit([{'id': '1', 'text': 'a'}])
+    wait_for(jobs, job_id, 'done')
+
+    # Задание выполняется другим контейнером с той же базой: его процесс отсюда не проверить
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "UPDATE jobs SET status = 'running', owner = ?, updated_at = ?, finished_at = NULL WHERE id = ?",
+            ('other-host/boot:1', time.time(), job_id)
+        )
+    assert AnalysisJobs(path, process, stale_after=60).get(job_id)['status'] == 'running'
+
+    with sqlite3.connect(path) as connection:
+        connection.execute('UPDATE jobs SET updated_at = ? WHERE id = ?', (time.time() - 61, job_id))
+    job = AnalysisJobs(path, process, stale_after=60).get(job_id)
+    assert job['status'] == 'failed'
+    assert 'not updated' in job['error']
@@ -0,0 +1,60 @@
+import importlib
+import threading
+import time
+import pytest
+
+
+@pytest.fixture(scope='module')
+def app_module(tmp_path_factory):
+    # Сервис без модели: BACKEND=stub, кэши и задания - во временном каталоге
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('BACKEND', 'stub')
+        patch.setenv('BACKEND_API_URL', 'http://localhost')
+        patch.setenv('CACHE_SIZE', '0')
+        patch.setenv('TOKEN_CACHE_SIZE', '0')
+        patch.setenv('PERSISTENT_CACHE_PATH', '')
+        patch.setenv('JOBS_DB_PATH', str(tmp_path_factory.mktemp('jobs') / 'jobs.db'))
+        yield importlib.import_module('app')
+
+
+def test_readiness_follows_warmup(app_module, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(app_module.emotion_classifier, 'warmup', lambda: release.wait(5))
+    monkeypatch.setattr(app_module, '_warmup_pid', None)
+    monkeypatch.setitem(app_module.readiness, 'status', 'starting')
+    client = app_module.app.test_client()
+
+    # Первый запрос запускает прогрев, до его окончания сервис не готов
+    assert client.get('/readyz').status_code == 503
+    assert client.get('/healthz').status_code == 200
+    assert client.get('/healthz').get_json() == {'status': 'ok'}
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while client.get('/readyz').status_code != 200:
+        assert time.monotonic() < deadline, 'warmup did not finish'
+        time.sleep(0.01)
+    assert client.get('/readyz').get_json()['status'] == 'ready'
+
+    response = client.post('/api/analyze', json={'comments': [{'id': '1', 'text': 'Я тебя люблю'}]})
+    assert response.status_code == 200
+
+
+def test_failed_warmup_is_reported(app_module, monkeypatch):
+    def failing_warmup():
+        raise RuntimeError('no weights')
+
+    monkeypatch.setattr(app_module.emotion_classifier, 'warmup', failing_warmup)
+    monkeypatch.setattr(app_module, '_warmup_pid', None)
+    monkeypatch.setitem(app_module.readiness, 'status', 'starting')
+    monkeypatch.setitem(app_module.readiness, 'error', None)
+    client = app_module.app.test_client()
+
+    client.get('/healthz')
+    deadline = time.monotonic() + 5
+    while app_module.readiness['status'] != 'failed':
+        assert time.monotonic() < deadline, 'warmup did not fail'
+        time.sleep(0.01)
+    response = client.get('/readyz')
+    assert response.status_code == 503
+    assert response.get_json()['error'] == 'RuntimeError: no weights'
@@ -0,0 +1,62 @@
+import pytest
+import threading
+from batch_scheduler import MicroBatchScheduler
+
+
+def test_concurrent_requests_share_batch():
+    calls = []
+
+    def forward(texts, timings=None):
+        calls.append(list(texts))
+        timings['model_ms'] = 5.0
+        return [text.upper() for text in texts]
+
+    scheduler = MicroBatchScheduler(forward, max_batch_size=6, max_wait_ms=200)
+    requests = [['a', 'b'], ['c'], ['d', 'e', 'f']]
+    results = [None] * len(requests)
+    timings = [{} for _ in requests]
+
+    def submit(i):
+        results[i] = scheduler.forward(requests[i], timings=timings[i])
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [['A', 'B'], ['C'], ['D', 'E', 'F']]
+    assert len(calls) == 1
+    assert all(t['model_ms'] == 5.0 and t['queue_ms'] >= 0 for t in timings)
+    stats = scheduler.stats()
+    assert (stats['batches'], stats['requests'], stats['texts']) == (1, 3, 6)
+    assert stats['avg_fill_ratio'] == 1.0
+
+
+def test_error_is_raised_in_caller():
+    def forward(texts, timings=None):
+        raise RuntimeError('model failed')
+
+    scheduler = MicroBatchScheduler(forward, max_wait_ms=1)
+    with pytest.raises(RuntimeError, match='model failed'):
+        scheduler.forward(['a'])
+
+
+def test_oversized_request_does_not_overstate_fill_ratio():
+    scheduler = MicroBatchScheduler(lambda texts, timings=None: list(texts), max_batch_size=4, max_wait_ms=1)
+    scheduler.forward(['a'] * 10)
+    scheduler.forward(['a', 'b'])
+    assert scheduler.stats()['avg_fill_ratio'] == 0.75
+
+
+def test_classifier_runs_full_micro_batch_in_one_pass():
+    from emotion_classifier import EmotionClassifier
+
+    classifier = EmotionClassifier('stub', backend='stub', cache=None, token_cache_size=0)
+    classifier.enable_micro_batching(max_batch_size=64, max_wait_ms=1)
+    shapes = []
+    backend = classifier.backend
+    classifier.backend = lambda input_ids, attention_mask: shapes.append(input_ids.shape) or backend(input_ids, attention_mask)
+
+    classifier.scheduler.forward([f'текст {i}' for i in range(64)])
+    assert [shape[0] for shape in shapes] == [64]
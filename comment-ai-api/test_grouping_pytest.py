@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from emotion_classifier import EmotionClassifier
+
+
+@pytest.fixture
+def deduplicated_grouping(monkeypatch):
+    """Группировка 'a' без повторов классов - на ней оба пути должны совпадать"""
+    grouping = {
+        part: {name: list(dict.fromkeys(classes)) for name, classes in groups.items()}
+        for part, groups in EmotionClassifier.GROUPINGS['a'].items()
+    }
+    monkeypatch.setitem(EmotionClassifier.GROUPINGS, 'test', grouping)
+    monkeypatch.setattr(EmotionClassifier, '_compiled_groupings', {})
+    return 'test'
+
+
+def random_probabilities(size, seed=0):
+    rnd = np.random.default_rng(seed)
+    probabilities = rnd.random((size, len(EmotionClassifier.CLASSES))) ** rnd.uniform(1, 12, (size, 1))
+    return probabilities.astype(np.float32)
+
+
+@pytest.mark.parametrize('neutral_decrease', [0.0, 0.1, 0.3])
+def test_vectorized_matches_compat(deduplicated_grouping, neutral_decrease):
+    probabilities = random_probabilities(2000)
+    vectorized = EmotionClassifier._classify_probabilities(probabilities, deduplicated_grouping, neutral_decrease)
+    corrections = set()
+    for probs, result in zip(probabilities, vectorized):
+        prediction = dict(sorted(
+            ((emotion, float(prob)) for emotion, prob in zip(EmotionClassifier.CLASSES, probs)),
+            key=lambda pair: -pair[1]
+        ))
+        expected = EmotionClassifier._classify_prediction(prediction, deduplicated_grouping, neutral_decrease)
+        assert result['emotion'] == expected['emotion']
+        assert result['sentiment'] == expected['sentiment']
+        assert result['raw_emotion'] == expected['raw_emotion']
+        assert result['information']['correction'] == expected['information']['correction']
+        assert list(result['information']['emotions']) == list(expected['information']['emotions'])
+        corrections.update(c.rsplit('-', 1)[0] for c in result['information']['correction'])
+    if neutral_decrease:
+        assert {'neutral-decrease-emotion', 'sentiment-controversial'} <= corrections
+
+
+def test_duplicated_classes_counted_once():
+    names, matrix = EmotionClassifier._compiled_grouping('a')['emotions']
+    sadness = matrix[:, names.index('sadness')]
+    assert sadness[EmotionClassifier.CLASSES.index('grief')] == 1
+    assert sadness.sum() == 5
+
+
+def test_lean_matches_full():
+    probabilities = random_probabilities(500, seed=1)
+    full = EmotionClassifier._classify_probabilities(probabilities, 'a', 0.1)
+    lean = EmotionClassifier._classify_probabilities(probabilities, 'a', 0.1, detail='lean', top_k=3)
+    for full_result, lean_result in zip(full, lean):
+        assert 'information' not in lean_result
+        assert lean_result['emotion'] == full_result['emotion']
+        assert lean_result['sentiment'] == full_result['sentiment']
+        assert lean_result['raw_emotion'] == full_result['raw_emotion']
+        assert lean_result['top_emotions'] == list(full_result['information']['raw_emotions'].items())[:3]
@@ -0,0 +1,119 @@
+import time
+import pytest
+from inference_cache import InferenceCache, PersistentPredictionCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction():
+    cache = InferenceCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_ttl_expiration():
+    clock = FakeClock()
+    cache = InferenceCache(max_size=10, ttl=5, clock=clock)
+    cache.put('a', 1)
+    clock.now = 4
+    assert cache.get('a') == 1
+    clock.now = 6
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_stats_and_key():
+    cache = InferenceCache()
+    key = InferenceCache.make_key('спасибо', 'a', 0.1, 'model')
+    assert key == InferenceCache.make_key('спасибо', 'a', 0.1, 'model')
+    assert key != InferenceCache.make_key('спасибо', 'a', 0.2, 'model')
+    assert cache.get(key) is None
+    cache.put(key, {'emotion': 'joy'})
+    assert cache.get(key) == {'emotion': 'joy'}
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (1, 1, 0.5)
+
+
+def test_persistent_cache_roundtrip_and_prune(tmp_path):
+    path = str(tmp_path / 'predictions.db')
+    probs = [i / 28 for i in range(28)]
+
+    cache = PersistentPredictionCache(path)
+    cache.put_many(['спасибо'], [probs], 'model-1')
+    assert cache.get_many(['спасибо', 'класс'], 'model-1')[1] is None
+
+    reopened = PersistentPredictionCache(path)
+    stored = reopened.get_many(['спасибо'], 'model-1')[0]
+    assert list(stored) == pytest.approx(probs)
+    assert reopened.get_many(['спасибо'], 'model-2') == [None]
+
+    # Записи другой модели не удаляются сразу: её воркеры могут ещё работать
+    clock = FakeClock()
+    clock.now = time.time()
+    reopened = PersistentPredictionCache(path, stale_after=60, clock=clock)
+    reopened.prune('model-2')
+    assert reopened.stats()['size'] == 1
+    clock.now += 61
+    reopened.prune('model-2')
+    assert reopened.stats()['size'] == 0
+
+
+def test_persistent_cache_max_rows_is_enforced_on_put(tmp_path):
+    clock = FakeClock()
+    cache = PersistentPredictionCache(str(tmp_path / 'predictions.db'), max_rows=5, trim_every=3, clock=clock)
+    for i in range(10):
+        clock.now = i
+        cache.put_many([f'текст {i}'], [[0.5] * 28], 'model-1')
+    assert cache.stats()['size'] <= 5 + 2
+    assert cache.get_many(['текст 9'], 'model-1')[0] is not None
+    assert cache.get_many(['текст 0'], 'model-1') == [None]
+
+    # trim_every по умолчанию (1000) больше max_rows - проверка не реже, чем раз в max_rows строк
+    cache = PersistentPredictionCache(str(tmp_path / 'default.db'), max_rows=50, clock=clock)
+    for i in range(800):
+        clock.now = i
+        cache.put_many([f'текст {i}'], [[0.5] * 28], 'model-1')
+    assert cache.stats()['size'] <= 2 * 50
+
+
+def test_model_fingerprint_does_not_read_weights(tmp_path):
+    import os
+    from types import SimpleNamespace
+    from emotion_classifier import EmotionClassifier, write_weights_hash
+
+    def fingerprint(path):
+        classifier = SimpleNamespace(
+            MODEL_NAME=EmotionClassifier.MODEL_NAME, backend=SimpleNamespace(name='torch'),
+            quantize=False, model_dir=None, model_path=str(path),
+        )
+        return EmotionClassifier._fingerprint(classifier)
+
+    weights = tmp_path / 'model.pth'
+    weights.write_bytes(b'weights-1')
+    assert fingerprint(weights) == fingerprint(weights)
+    copy = tmp_path / 'copy.pth'
+    copy.write_bytes(b'weights-1')
+    assert fingerprint(copy) != fingerprint(weights)
+
+    # С записанным хэшем отпечаток зависит от содержимого, а не от пути
+    write_weights_hash(str(weights))
+    write_weights_hash(str(copy))
+    assert fingerprint(copy) == fingerprint(weights)
+
+    # Веса новее хэша - хэш не используется
+    weights.write_bytes(b'weights-2')
+    stat = os.stat(weights)
+    os.utime(weights, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert fingerprint(weights) != fingerprint(copy)
@@ -0,0 +1,83 @@
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+import pytest
+from train.labels import grouped_labels, multi_hot_labels
+
+CLASSES = [
+    'admiration', 'amusement', 'anger', 'annoyance', 'approval', 'caring', 'confusion',
+    'curiosity', 'desire', 'disappointment', 'disapproval', 'disgust', 'embarrassment',
+    'excitement', 'fear', 'gratitude', 'grief', 'joy', 'love', 'nervousness', 'optimism',
+    'pride', 'realization', 'relief', 'remorse', 'sadness', 'surprise', 'neutral'
+]
+# Как в train_with_group.py
+EMOTION_MAPPING = {
+    'admiration': 'joy', 'amusement': 'joy', 'anger': 'anger', 'annoyance': 'anger',
+    'approval': 'anger', 'caring': None, 'confusion': 'surprise', 'curiosity': None,
+    'desire': None, 'disappointment': 'sadness', 'disapproval': None, 'disgust': None,
+    'embarrassment': 'sadness', 'excitement': 'joy', 'fear': 'fear', 'gratitude': 'joy',
+    'grief': 'sadness', 'joy': 'joy', 'love': 'joy', 'nervousness': None, 'optimism': 'joy',
+    'pride': 'joy', 'realization': 'surprise', 'relief': 'surprise', 'remorse': 'sadness',
+    'sadness': 'sadness', 'surprise': 'surprise', 'neutral': 'neutral'
+}
+TARGET_EMOTIONS = ['joy', 'anger', 'fear', 'surprise', 'sadness', 'neutral']
+
+
+def legacy_multi_hot_labels(df, classes):
+    """Прежняя построчная версия из train_raw.load_and_prepare_data"""
+    labels = []
+    for _, row in df.iterrows():
+        if row.get('example_very_unclear', False) or row[classes[:-1]].sum() == 0:
+            label = [0] * (len(classes)-1) + [1]
+        else:
+            label = row[classes[:-1]].tolist() + [0]
+
+        labels.append(label)
+    return np.array(labels)
+
+
+def legacy_process_emotion_row(row):
+    """Прежняя process_emotion_row из train_with_group.py"""
+    emotion_counts = defaultdict(int)
+
+    for col, target in EMOTION_MAPPING.items():
+        if target is None or row[col] != 1:
+            continue
+        emotion_counts[target] += 1
+
+    result = None
+    if not emotion_counts:
+        result = 'neutral'
+    elif len(emotion_counts) == 1:
+        result = list(emotion_counts.keys())[0]
+    return result
+
+
+def make_dataset(rows, seed=0, with_unclear=True):
+    rnd = np.random.RandomState(seed)
+    df = pd.DataFrame((rnd.rand(rows, len(CLASSES)) < 0.05).astype(np.int64), columns=CLASSES)
+    df.insert(0, 'translated_text', [f'text {i}' for i in range(rows)])
+    if with_unclear:
+        df['example_very_unclear'] = rnd.rand(rows) < 0.1
+    return df
+
+
+@pytest.mark.parametrize('with_unclear', [True, False])
+def test_multi_hot_labels_match_iterrows(with_unclear):
+    df = make_dataset(2000, with_unclear=with_unclear)
+    expected = legacy_multi_hot_labels(df, CLASSES)
+    actual = multi_hot_labels(df, CLASSES)
+    assert actual.dtype == expected.dtype
+    assert np.array_equal(actual, expected)
+
+
+def test_grouped_labels_match_process_emotion_row():
+    df = make_dataset(2000, seed=1)
+    expected = [
+        TARGET_EMOTIONS.index(emotion) if isinstance(emotion, str) else -1
+        for emotion in df.apply(legacy_process_emotion_row, axis=1)
+    ]
+    actual = grouped_labels(df, EMOTION_MAPPING, TARGET_EMOTIONS)
+    assert actual.tolist() == expected
+    # В выборке есть все варианты: neutral, одна группа, конфликт
+    assert {-1, TARGET_EMOTIONS.index('neutral')} < set(actual.tolist())
@@ -0,0 +1,39 @@
+import pytest
+from metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = Histogram('latency_seconds', 'Latency', labelnames=('stage',), registry=registry, buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 3):
+        histogram.observe(value, stage='model')
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ['# HELP latency_seconds Latency', '# TYPE latency_seconds histogram']
+    assert lines[2:] == [
+        'latency_seconds_bucket{stage="model",le="0.1"} 1',
+        'latency_seconds_bucket{stage="model",le="1"} 3',
+        'latency_seconds_bucket{stage="model",le="+Inf"} 4',
+        'latency_seconds_sum{stage="model"} 4.05',
+        'latency_seconds_count{stage="model"} 4',
+    ]
+
+
+def test_counter_and_function_gauge():
+    registry = Registry()
+    counter = Counter('comments_total', 'Comments', registry=registry)
+    counter.inc(3)
+    counter.inc()
+    Gauge('queue_depth', 'Queue', labelnames=('queue',), registry=registry,
+          function=lambda: {('jobs',): 2, ('micro_batch',): None})
+
+    text = registry.render()
+    assert 'comments_total 4\n' in text
+    assert 'queue_depth{queue="jobs"} 2\n' in text
+    assert 'micro_batch' not in text
+
+
+def test_labels_must_match():
+    histogram = Histogram('latency_seconds', 'Latency', labelnames=('stage',), registry=None)
+    with pytest.raises(ValueError):
+        histogram.observe(1.0)
@@ -1,3 +1,4 @@
+import os
 import pytest
 from emotion_classifier import EmotionClassifier
 
@@ -20,3 +21,60 @@ def test_classification(sentiment_expect, emotion_expect, text):
     assert result['sentiment'] == sentiment_expect
     assert result['emotion'] == emotion_expect
     ...
+
+
+def test_classify_batch_matches_classify():
+    texts = [
+        'Я тебя люблю',
+        'Я тебя ненавижу',
+        'Мне стало страшно',
+        'Это очень печально',
+        'Я расплакалась',
+        'Не думал, что такое возможно. Очень интересно',
+        'Земля вращается вокруг Солнца',
+    ]
+    batch_results = emotion_classifier.classify_batch(texts, grouping=grouping, batch_size=3)
+    for text, batch_result in zip(texts, batch_results):
+        single_result = emotion_classifier.classify(text, grouping=grouping)
+        assert batch_result['sentiment'] == single_result['sentiment']
+        assert batch_result['emotion'] == single_result['emotion']
+        assert batch_result['raw_emotion'] == single_result['raw_emotion']
+
+
+def test_dynamic_padding_matches_max_length_padding():
+    texts = ['Я тебя люблю', 'Не думал, что такое возможно. Очень интересно', 'Мне стало страшно']
+    static_classifier = EmotionClassifier('./model/trained/model.pth', dynamic_padding=False)
+    dynamic_classifier = EmotionClassifier('./model/trained/model.pth', dynamic_padding=True)
+    static_predictions = static_classifier.predict_raw_batch(texts)
+    dynamic_predictions = dynamic_classifier.predict_raw_batch(texts)
+    for static, dynamic in zip(static_predictions, dynamic_predictions):
+        assert static.keys() == dynamic.keys()
+        for emotion in static:
+            assert dynamic[emotion] == pytest.approx(static[emotion], abs=1e-5)
+
+
+@pytest.mark.skipif(not os.path.exists('./model/trained/model.onnx'), reason='run export_onnx.py first')
+def test_onnx_backend_matches_torch():
+    texts = ['Я тебя люблю', 'Не думал, что такое возможно. Очень интересно', 'Мне стало страшно']
+    onnx_classifier = EmotionClassifier(
+        './model/trained/model.pth', backend='onnx', onnx_path='./model/trained/model.onnx'
+    )
+    for expected, actual in zip(emotion_classifier.predict_raw_batch(texts), onnx_classifier.predict_raw_batch(texts)):
+        for emotion in expected:
+            assert actual[emotion] == pytest.approx(expected[emotion], abs=1e-4)
+
+
+@pytest.mark.skipif(not os.path.isdir('./model/trained/model'), reason='run convert_model.py first')
+def test_safetensors_directory_matches_checkpoint():
+    texts = ['Я тебя люблю', 'Не думал, что такое возможно. Очень интересно', 'Мне стало страшно']
+    converted_classifier = EmotionClassifier('./model/trained/model')
+    for expected, actual in zip(emotion_classifier.predict_raw_batch(texts), converted_classifier.predict_raw_batch(texts)):
+        for emotion in expected:
+            assert actual[emotion] == pytest.approx(expected[emotion], abs=1e-5)
+
+
+def test_warmup_runs_all_shapes():
+    shapes = emotion_classifier.warmup(batch_sizes=[1, 4], lengths=[8, EmotionClassifier.MAX_LEN])
+    assert [(batch_size, length) for batch_size, length, _ in shapes] == [
+        (1, 8), (1, EmotionClassifier.MAX_LEN), (4, 8), (4, EmotionClassifier.MAX_LEN)
+    ]
@@ -0,0 +1,18 @@
+import os
+import pstats
+import pytest
+from profiling import RequestProfiler
+
+
+def test_cprofile_trace_is_written(tmp_path):
+    profiler = RequestProfiler(str(tmp_path / 'traces'))
+    with profiler.trace('analyze') as trace:
+        sorted(range(1000), key=lambda x: -x)
+
+    assert os.path.dirname(trace['path']) == str(tmp_path / 'traces')
+    assert pstats.Stats(trace['path']).total_calls > 0
+
+
+def test_unknown_profiler():
+    with pytest.raises(ValueError):
+        RequestProfiler('.', 'perf')
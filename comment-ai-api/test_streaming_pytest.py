@@ -0,0 +1,37 @@
+import io
+import json
+import pytest
+from streaming import iter_json_comments, iter_ndjson_comments, batched
+
+COMMENTS = [
+    {'id': 1, 'text': 'спасибо'},
+    {'id': 'a-2', 'text': 'Класс! {"comments": []}'},
+    {'id': 12345, 'text': 'ещё один комментарий'},
+]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 64 * 1024])
+def test_json_comments_are_parsed_incrementally(chunk_size):
+    body = json.dumps({'meta': {'x': [1, 2]}, 'comments': COMMENTS, 'tail': 100}, ensure_ascii=False)
+
+    class Stream(io.BytesIO):
+        def read(self, size=-1):
+            return super().read(min(size, chunk_size))
+
+    assert list(iter_json_comments(Stream(body.encode('utf-8')))) == COMMENTS
+
+
+def test_empty_and_invalid_json_bodies():
+    assert list(iter_json_comments(io.BytesIO(b'{}'))) == []
+    assert list(iter_json_comments(io.BytesIO(b'{"comments": []}'))) == []
+    with pytest.raises(ValueError):
+        list(iter_json_comments(io.BytesIO(b'{"comments": [{"id": 1} {"id": 2}]}')))
+
+
+def test_ndjson_comments():
+    body = '\n'.join(json.dumps(comment, ensure_ascii=False) for comment in COMMENTS) + '\n\n'
+    assert list(iter_ndjson_comments(io.BytesIO(body.encode('utf-8')), chunk_size=5)) == COMMENTS
+
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
@@ -0,0 +1,46 @@
+import re
+import string
+import pytest
+from emotion_classifier import EmotionClassifier
+from text_preprocessing import preprocess_text, preprocess_batch
+
+
+def training_preprocess_text(text):
+    """Предобработка, с которой обучалась модель (train_raw.py до выноса в text_preprocessing)"""
+    if not isinstance(text, str):
+        return ""
+    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'@\w+', '', text)
+    text = re.sub(r'<.*?>', '', text)
+    text = text.translate(str.maketrans('', '', string.punctuation))
+    text = re.sub(r'\s+', ' ', text).strip()
+    text = text.lower()
+    return text
+
+
+TEXTS = [
+    'Я тебя люблю',
+    'Не думал, что такое возможно. Очень интересно!!!',
+    '@ivan_petrov спасибо, https://example.com/path?x=1 и www.site.ru тоже',
+    '<b>Жирный</b> текст <br/> с тегами',
+    '   Много    пробелов\tи\nпереносов   ',
+    'КЛАСС!!! 😀 (смайлики) ...',
+    'e-mail: test@mail.ru, #хэштег',
+    '',
+    None,
+]
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_serving_matches_training(text):
+    expected = training_preprocess_text(text)
+    assert preprocess_text(text) == expected
+    if text is not None:
+        assert EmotionClassifier._preprocess(text) == expected
+
+
+def test_batch_matches_single():
+    texts = TEXTS * 500
+    expected = [preprocess_text(text) for text in texts]
+    assert preprocess_batch(texts) == expected
+    assert preprocess_batch(texts, workers=2, chunk_size=100) == expected
@@ -0,0 +1,105 @@
+import pickle
+import numpy as np
+import torch
+from inference_backends import StubTokenizer
+from train.training_data import (
+    DynamicPaddingCollator, LengthGroupedBatchSampler, TokenizedDataset, create_data_loader, prepare_token_cache
+)
+
+
+def test_token_cache_is_built_once(tmp_path):
+    dataset_path = tmp_path / 'translated1.csv'
+    dataset_path.write_text('translated_text\n')
+    texts = ['я тебя люблю', 'спасибо', 'это очень странно и даже страшно']
+    labels = [[0, 1], [1, 0], [1, 1]]
+    calls = []
+
+    def load_data():
+        calls.append(1)
+        return texts, labels
+
+    args = (str(tmp_path / 'cache'), [str(dataset_path)], StubTokenizer(), 'stub', 6, 'multi_hot', load_data)
+    path = prepare_token_cache(*args)
+    assert prepare_token_cache(*args) == path
+    assert calls == [1]
+
+    dataset = TokenizedDataset(path, indices=[2, 0])
+    expected = StubTokenizer()(texts[2], max_length=6, truncation=True)['input_ids']
+    item = dataset[0]
+    assert item['input_ids'].tolist() == expected
+    assert torch.equal(item['labels'], torch.tensor([1.0, 1.0]))
+    assert dataset.lengths().tolist() == [6, 5]
+    assert dataset.labels().tolist() == [[1, 1], [0, 1]]
+
+    # Для воркеров DataLoader передаётся путь, а не открытые массивы
+    copy = pickle.loads(pickle.dumps(dataset))
+    assert copy._arrays is None
+    assert np.array_equal(copy.token_ids(1), dataset.token_ids(1))
+
+
+def test_collator_pads_to_longest_sample():
+    samples = [
+        {'input_ids': torch.tensor([101, 5, 102]), 'label': torch.tensor(2)},
+        {'input_ids': torch.tensor([101, 102]), 'label': torch.tensor(0)},
+    ]
+    batch = DynamicPaddingCollator(0, 'label')(samples)
+    assert batch['input_ids'].tolist() == [[101, 5, 102], [101, 102, 0]]
+    assert batch['attention_mask'].tolist() == [[1, 1, 1], [1, 1, 0]]
+    assert batch['label'].tolist() == [2, 0]
+
+    assert DynamicPaddingCollator(0, 'label', pad_to=5)(samples)['input_ids'].shape == (2, 5)
+
+
+def test_length_grouped_sampler_covers_dataset_in_similar_length_batches():
+    lengths = np.random.default_rng(0).integers(3, 128, size=1000)
+    sampler = LengthGroupedBatchSampler(lengths, batch_size=16, group_factor=8)
+    first, second = list(sampler), list(sampler)
+
+    assert len(first) == len(sampler)
+    assert sorted(i for batch in first for i in batch) == list(range(1000))
+    # Порядок пачек меняется от эпохи к эпохе
+    assert first != second
+
+    padded = sum(len(batch) * lengths[batch].max() for batch in first)
+    random_padded = sum(
+        len(batch) * lengths[batch].max()
+        for batch in np.array_split(np.random.default_rng(1).permutation(1000), len(first))
+    )
+    assert padded < random_padded * 0.7
+
+
+def test_worker_loader_yields_same_batches(tmp_path):
+    texts = ['слово ' * n for n in range(1, 40)]
+    path = prepare_token_cache(
+        str(tmp_path / 'cache'), [], StubTokenizer(), 'stub', 32, 'grouped',
+        lambda: (texts, list(range(len(texts))))
+    )
+    dataset = TokenizedDataset(path, label_key='label', label_dtype=torch.long)
+
+    serial = list(create_data_loader(dataset, 8, max_len=32))
+    parallel = create_data_loader(dataset, 8, max_len=32, num_workers=1, prefetch_factor=2)
+    assert parallel.persistent_workers
+    for expected, batch in zip(serial, parallel):
+        assert torch.equal(expected['input_ids'], batch['input_ids'])
+        assert torch.equal(expected['label'], batch['label'])
+
+
+def test_changed_label_mapping_invalidates_cache(tmp_path):
+    dataset_path = tmp_path / 'translated1.csv'
+    dataset_path.write_text('translated_text\n')
+    calls = []
+
+    def load_data():
+        calls.append(1)
+        return ['спасибо'], [0]
+
+    def prepare(mapping):
+        return prepare_token_cache(
+            str(tmp_path / 'cache'), [str(dataset_path)], StubTokenizer(), 'stub', 8, 'grouped', load_data,
+            labels_config={'mapping': mapping, 'targets': ['joy', 'neutral'], 'version': 1}
+        )
+
+    path = prepare({'joy': 'joy', 'amusement': 'joy'})
+    assert prepare({'amusement': 'joy', 'joy': 'joy'}) == path
+    assert prepare({'joy': 'joy', 'amusement': None}) != path
+    assert calls == [1, 1]
@@ -0,0 +1,44 @@
+import json
+import sys
+import pytest
+import torch
+from train import training_runtime
+from train.training_runtime import autocast, resolve_precision, run_report, save_run_report
+
+
+def test_bf16_falls_back_to_fp32_without_cpu_support(monkeypatch):
+    monkeypatch.setattr(training_runtime, 'bf16_supported', lambda: False)
+    assert resolve_precision('bf16') == 'fp32'
+    with pytest.raises(ValueError):
+        resolve_precision('fp16')
+
+    with autocast('bf16'):
+        assert (torch.ones(2, 2) @ torch.ones(2, 2)).dtype == torch.bfloat16
+    with autocast('fp32'):
+        assert (torch.ones(2, 2) @ torch.ones(2, 2)).dtype == torch.float32
+
+
+def test_run_reports_are_compared_with_fp32_baseline(tmp_path, capsys):
+    path = str(tmp_path / 'training_report.jsonl')
+    epochs = [{'samples': 100, 'seconds': 2.0}, {'samples': 100, 'seconds': 2.0}]
+    save_run_report(path, run_report('train_raw', 'fp32', 64, 1, epochs, {'val_acc': 0.5}))
+    bf16 = run_report('train_raw', 'bf16', 16, 4, epochs[:1], {'val_acc': 0.51})
+    save_run_report(path, bf16)
+
+    assert bf16['effective_batch_size'] == 64
+    assert bf16['train_samples_s'] == 50.0
+    with open(path) as file:
+        assert [json.loads(line)['precision'] for line in file] == ['fp32', 'bf16']
+    assert 'vs fp32 baseline' in capsys.readouterr().out.splitlines()[-1]
+
+
+def test_peak_rss_without_resource_module(monkeypatch):
+    from benchmarks import measure
+
+    # В Windows нет ни /proc, ни модуля resource
+    monkeypatch.setattr(measure, '_proc_status', lambda field: None)
+    monkeypatch.setitem(sys.modules, 'resource', None)
+    peak = training_runtime.peak_rss_mb()
+    assert peak is None or peak > 0
+    report = run_report('train_raw', 'fp32', 64, 1, [{'samples': 10, 'seconds': 1.0}], {})
+    assert report['peak_rss_mb'] == (round(peak, 1) if peak is not None else None)
@@ -0,0 +1,50 @@
+"""
+Предобработка текста - общая для обучения (train/*) и инференса
+(EmotionClassifier), чтобы модель получала тексты в том же виде, что и при обучении
+"""
+from concurrent.futures import ProcessPoolExecutor
+import re
+import string
+
+URL_PATTERN = re.compile(r'http\S+|www\S+|https\S+', flags=re.MULTILINE)
+MENTION_PATTERN = re.compile(r'@\w+')
+HTML_TAG_PATTERN = re.compile(r'<.*?>')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+
+# Версия правил предобработки - увеличивается при любом их изменении,
+# чтобы устарели кэши уже предобработанных и токенизированных данных
+PREPROCESSING_VERSION = 1
+
+
+def preprocess_text(text):
+    if not isinstance(text, str):
+        return ""
+    # Удаление URL
+    text = URL_PATTERN.sub('', text)
+    # Удаление упоминаний пользователей
+    text = MENTION_PATTERN.sub('', text)
+    # Удаление HTML тегов
+    text = HTML_TAG_PATTERN.sub('', text)
+    # Удаление пунктуации
+    text = text.translate(PUNCTUATION_TABLE)
+    # Удаление лишних пробелов
+    text = WHITESPACE_PATTERN.sub(' ', text).strip()
+    # Приведение к нижнему регистру
+    return text.lower()
+
+
+def preprocess_batch(texts, workers=None, chunk_size=5000):
+    """
+    Предобработка списка текстов
+    Args:
+        texts (list): Тексты
+        workers (int): Количество процессов (None или 1 - в текущем процессе)
+        chunk_size (int): Размер порции текстов для одного процесса
+    Returns:
+        list: Предобработанные тексты в том же порядке
+    """
+    if workers and workers > 1 and len(texts) > chunk_size:
+        with ProcessPoolExecutor(workers) as executor:
+            return list(executor.map(preprocess_text, texts, chunksize=chunk_size))
+    return [preprocess_text(text) for text in texts]
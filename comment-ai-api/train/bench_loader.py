@@ -0,0 +1,135 @@
+"""
+Подбор параметров загрузки данных и потоков torch для обучения на CPU:
+для каждой комбинации NUM_WORKERS / TORCH_THREADS / TORCH_INTEROP_THREADS
+в отдельном процессе выполняется несколько шагов обучения (прямой и
+обратный проход, шаг оптимизатора) на токенизированном кэше. Замеряются
+примеры в секунду и доля времени, которую шаг ждёт пачку от DataLoader.
+С --cores процессы ограничиваются первыми N ядрами - результат
+соответствует машине с таким числом ядер.
+Запуск из каталога comment-ai-api (кэш строят train_raw.py / train_with_group.py):
+    python train/bench_loader.py --cache token_cache/multi_hot-<ключ> --model bert-base-multilingual-uncased
+    python train/bench_loader.py --cache token_cache/grouped-<ключ> --cores 8 --workers 0 1 2 4 --threads 4 6 8
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+
+import torch
+from transformers import AutoModelForSequenceClassification
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from training_data import TokenizedDataset, create_data_loader
+from training_runtime import available_cores, configure_threads
+
+
+def run_config(args, workers, threads, interop_threads):
+    """Запуск в отдельном процессе: шаги обучения с одной комбинацией параметров"""
+    if args.cores:
+        os.sched_setaffinity(0, sorted(os.sched_getaffinity(0))[:args.cores])
+    threads, interop_threads = configure_threads(threads, interop_threads, workers)
+
+    multi_label = TokenizedDataset(args.cache).labels().ndim == 2
+    dataset = TokenizedDataset(args.cache, label_dtype=torch.float32 if multi_label else torch.long)
+    num_labels = dataset.labels().shape[1] if multi_label else int(dataset.labels().max()) + 1
+    model = AutoModelForSequenceClassification.from_pretrained(
+        args.model, num_labels=num_labels,
+        problem_type='multi_label_classification' if multi_label else 'single_label_classification',
+    )
+    model.train()
+    optimizer = torch.optim.AdamW(model.parameters(), lr=2e-5)
+    loader = create_data_loader(
+        dataset, args.batch_size, shuffle=True, max_len=args.max_len,
+        num_workers=workers, prefetch_factor=args.prefetch_factor,
+    )
+
+    samples, wait_s, started_at = 0, 0.0, None
+    batches = iter(loader)
+    for step in range(args.warmup_steps + args.steps):
+        if step == args.warmup_steps:
+            samples, wait_s, started_at = 0, 0.0, time.perf_counter()
+        wait_started_at = time.perf_counter()
+        try:
+            batch = next(batches)
+        except StopIteration:
+            batches = iter(loader)
+            batch = next(batches)
+        wait_s += time.perf_counter() - wait_started_at
+
+        optimizer.zero_grad(set_to_none=True)
+        loss = model(**batch).loss
+        loss.backward()
+        optimizer.step()
+        samples += batch['input_ids'].size(0)
+    elapsed = time.perf_counter() - started_at
+
+    print(json.dumps({
+        'workers': workers,
+        'threads': threads,
+        'interop_threads': interop_threads,
+        'samples_s': round(samples / elapsed, 2),
+        'data_wait_pct': round(100 * wait_s / elapsed, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cache', required=True, help='Каталог токенизированного кэша')
+    parser.add_argument('--model', default='bert-base-multilingual-uncased')
+    parser.add_argument('--cores', type=int, help='Ограничить процессы первыми N ядрами')
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, 2, 4])
+    parser.add_argument('--threads', type=int, nargs='+',
+                        help='intra-op потоки (по умолчанию - ядра за вычетом воркеров)')
+    parser.add_argument('--interop-threads', type=int, nargs='+', default=[1])
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--max-len', type=int, default=128)
+    parser.add_argument('--prefetch-factor', type=int, default=2)
+    parser.add_argument('--steps', type=int, default=20)
+    parser.add_argument('--warmup-steps', type=int, default=3)
+    parser.add_argument('--output', help='JSON-файл с результатами')
+    parser.add_argument('--run', type=int, nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        workers, threads, interop_threads = args.run
+        run_config(args, workers, threads or None, interop_threads)
+        return
+
+    cores = args.cores or available_cores()
+    configs = [
+        (workers, threads, interop_threads)
+        for workers, threads, interop_threads in itertools.product(
+            args.workers, args.threads or [0], args.interop_threads)
+        # 0 потоков - по умолчанию (ядра за вычетом воркеров); больше ядер - заведомо переподписка
+        if workers + threads <= cores
+    ]
+
+    print(f'cores={cores}')
+    print(f'{"workers":>7} {"threads":>7} {"interop":>7} {"samples/s":>10} {"data wait":>10}')
+    results = []
+    for workers, threads, interop_threads in configs:
+        command = [sys.executable, __file__, '--run', str(workers), str(threads), str(interop_threads)]
+        for name in ('cache', 'model', 'cores', 'batch_size', 'max_len', 'prefetch_factor', 'steps', 'warmup_steps'):
+            if getattr(args, name) is not None:
+                command += ['--' + name.replace('_', '-'), str(getattr(args, name))]
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results.append(result)
+        print(f'{result["workers"]:>7} {result["threads"]:>7} {result["interop_threads"]:>7} '
+              f'{result["samples_s"]:>10.1f} {result["data_wait_pct"]:>9.1f}%')
+
+    best = max(results, key=lambda result: result['samples_s'])
+    print(f'\nBest for {cores} cores: NUM_WORKERS = {best["workers"]}, TORCH_THREADS = {best["threads"]}, '
+          f'TORCH_INTEROP_THREADS = {best["interop_threads"]}')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'cores': cores, 'args': vars(args), 'results': results, 'best': best}, file, indent=2)
+        print(f'Saved to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
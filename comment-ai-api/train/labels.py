@@ -0,0 +1,65 @@
+"""
+Построение меток обучающих наборов целиком по столбцам numpy, без
+построчного обхода DataFrame (iterrows / apply(axis=1))
+"""
+import numpy as np
+
+# Версия правил построения меток и отбора примеров (neutral для неясных
+# примеров, пропуск конфликтов и неясных примеров в train_with_group) -
+# увеличивается при их изменении, чтобы кэш токенизированного набора
+# построился заново
+LABELS_VERSION = 1
+
+
+def multi_hot_labels(df, classes):
+    """
+    Multi-hot метки для train_raw: исходные классы classes[:-1] из столбцов
+    DataFrame, последний класс (neutral) - если пример помечен как неясный
+    (example_very_unclear) или у него нет ни одной эмоции
+    Returns:
+        numpy.ndarray: (количество строк, len(classes))
+    """
+    values = df[classes[:-1]].to_numpy()
+    neutral = np.nansum(values, axis=1) == 0
+    if 'example_very_unclear' in df.columns:
+        # astype(bool) - та же истинность, что у значения в if (NaN - истина)
+        neutral |= df['example_very_unclear'].to_numpy().astype(bool)
+
+    labels = np.zeros((len(df), len(classes)), dtype=values.dtype)
+    labels[:, :-1] = values
+    labels[neutral] = 0
+    labels[neutral, -1] = 1
+    return labels
+
+
+def mapping_matrix(mapping, targets):
+    """
+    Матрица отображения исходных классов в целевые группы
+    Args:
+        mapping (dict): {исходный класс: целевой класс или None}
+        targets (list): Целевые классы
+    Returns:
+        numpy.ndarray: (len(mapping), len(targets)), 1 - класс входит в группу
+    """
+    matrix = np.zeros((len(mapping), len(targets)), dtype=np.int64)
+    for row, target in enumerate(mapping.values()):
+        if target is not None:
+            matrix[row, targets.index(target)] = 1
+    return matrix
+
+
+def grouped_labels(df, mapping, targets, conflict=-1):
+    """
+    Индекс целевого класса для train_with_group: единственная группа среди
+    отмеченных исходных классов; без отмеченных классов - neutral; если
+    отмечены классы разных групп - conflict (такие примеры пропускаются)
+    Returns:
+        numpy.ndarray: Индексы в targets, conflict для конфликтов
+    """
+    marked = (df[list(mapping)].to_numpy() == 1).astype(np.int64)
+    present = (marked @ mapping_matrix(mapping, targets)) > 0
+    groups = present.sum(axis=1)
+
+    labels = np.where(groups == 1, present.argmax(axis=1), conflict)
+    labels[groups == 0] = targets.index('neutral')
+    return labels
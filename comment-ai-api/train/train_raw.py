@@ -1,15 +1,19 @@
 import os
+import sys
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from transformers import AutoTokenizer, AutoModelForSequenceClassification, get_linear_schedule_with_warmup
 from torch.optim import AdamW
-from torch.utils.data import Dataset, DataLoader
 import torch
 import torch.nn as nn
 from tqdm import tqdm
-import re
-import string
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from text_preprocessing import preprocess_batch
+from training_data import EpochStats, TokenizedDataset, create_data_loader, prepare_token_cache
+from training_runtime import autocast, configure_threads, resolve_precision, run_report, save_run_report
+from labels import LABELS_VERSION, multi_hot_labels
 
 
 class Config:
@@ -25,7 +29,10 @@ class Config:
 
     MODEL_NAME = "bert-base-multilingual-uncased"
     MAX_LEN = 128
-    BATCH_SIZE = 64
+    BATCH_SIZE = 64  # Пачка одного шага (прямой и обратный проход)
+    # Шаг оптимизатора - раз в GRADIENT_ACCUMULATION_STEPS пачек, эффективная
+    # пачка - BATCH_SIZE * GRADIENT_ACCUMULATION_STEPS
+    GRADIENT_ACCUMULATION_STEPS = 1
     EPOCHS = 1  # Можно увеличить при необходимости
     LEARNING_RATE = 2e-5
     NUM_WARMUP_STEPS = 0
@@ -40,49 +47,24 @@ class Config:
 
     EARLY_STOPPING_PATIENCE = 3
 
+    PREPROCESS_WORKERS = os.cpu_count()
+
+    # Токенизированный набор (см. training_data.py)
+    TOKEN_CACHE_DIR = "token_cache"
+    # Дополнение до самого длинного примера пачки и пачки из примеров близкой длины
+    DYNAMIC_PADDING = True
+    GROUP_BY_LENGTH = True
+
+    # Загрузка данных и потоки torch (подбор - train/bench_loader.py)
+    NUM_WORKERS = 2
+    PREFETCH_FACTOR = 2
+    TORCH_THREADS = None  # None - доступные ядра за вычетом NUM_WORKERS
+    TORCH_INTEROP_THREADS = 1
 
-def preprocess_text(text):
-    if not isinstance(text, str):
-        return ""
-    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'@\w+', '', text)
-    text = re.sub(r'<.*?>', '', text)
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    text = re.sub(r'\s+', ' ', text).strip()
-    text = text.lower()
-    return text
-
-
-class EmotionDataset(Dataset):
-    def __init__(self, texts, labels, tokenizer, max_len):
-        self.texts = texts
-        self.labels = labels
-        self.tokenizer = tokenizer
-        self.max_len = max_len
-
-    def __len__(self):
-        return len(self.texts)
-
-    def __getitem__(self, idx):
-        text = str(self.texts[idx])
-        label = self.labels[idx]
-
-        encoding = self.tokenizer.encode_plus(
-            text,
-            add_special_tokens=True,
-            max_length=self.max_len,
-            return_token_type_ids=False,
-            padding='max_length',
-            truncation=True,
-            return_attention_mask=True,
-            return_tensors='pt',
-        )
-
-        return {
-            'input_ids': encoding['input_ids'].flatten(),
-            'attention_mask': encoding['attention_mask'].flatten(),
-            'labels': torch.FloatTensor(label)
-        }
+    # 'fp32' или 'bf16' (autocast, только на CPU с AVX512-BF16 / AMX)
+    PRECISION = "fp32"
+    # Отчёты о запусках (JSON Lines) для сравнения bf16 с fp32
+    TRAINING_REPORT_PATH = "training_report.jsonl"
 
 
 def load_and_prepare_data(dataset_paths):
@@ -93,34 +75,34 @@ def load_and_prepare_data(dataset_paths):
 
     df = pd.concat(dfs, ignore_index=True)
     df = df[df['translated_text'].notna()]
-    df['cleaned_text'] = df['translated_text'].apply(preprocess_text)
+    df['cleaned_text'] = preprocess_batch(
+        df['translated_text'].tolist(), workers=Config.PREPROCESS_WORKERS)
 
-    labels = []
-    for _, row in df.iterrows():
-        if row.get('example_very_unclear', False) or row[Config.CLASSES[:-1]].sum() == 0:
-            label = [0] * (len(Config.CLASSES)-1) + [1]
-        else:
-            label = row[Config.CLASSES[:-1]].tolist() + [0]
-
-        labels.append(label)
+    labels = multi_hot_labels(df, Config.CLASSES)
 
-    return df['cleaned_text'].tolist(), np.array(labels)
+    return df['cleaned_text'].tolist(), labels
 
 
-def create_data_loaders(texts, labels, tokenizer):
-    train_texts, val_texts, train_labels, val_labels = train_test_split(
-        texts, labels, test_size=0.2, random_state=42
+def create_data_loaders(cache_path):
+    all_indices = np.arange(len(TokenizedDataset(cache_path)))
+    train_indices, val_indices = train_test_split(
+        all_indices, test_size=0.2, random_state=42
     )
 
-    train_dataset = EmotionDataset(
-        train_texts, train_labels, tokenizer, Config.MAX_LEN)
-    val_dataset = EmotionDataset(
-        val_texts, val_labels, tokenizer, Config.MAX_LEN)
+    train_dataset = TokenizedDataset(cache_path, train_indices)
+    val_dataset = TokenizedDataset(cache_path, val_indices)
 
-    train_loader = DataLoader(
-        train_dataset, batch_size=Config.BATCH_SIZE, shuffle=True)
-    val_loader = DataLoader(
-        val_dataset, batch_size=Config.BATCH_SIZE, shuffle=False)
+    loader_options = dict(
+        max_len=Config.MAX_LEN,
+        dynamic_padding=Config.DYNAMIC_PADDING,
+        group_by_length=Config.GROUP_BY_LENGTH,
+        num_workers=Config.NUM_WORKERS,
+        prefetch_factor=Config.PREFETCH_FACTOR,
+    )
+    train_loader = create_data_loader(
+        train_dataset, Config.BATCH_SIZE, shuffle=True, **loader_options)
+    val_loader = create_data_loader(
+        val_dataset, Config.BATCH_SIZE, shuffle=False, **loader_options)
 
     return train_loader, val_loader
 
@@ -135,12 +117,26 @@ def multi_label_accuracy(preds, labels):
 def train_model():
     device = torch.device("cpu")
     print(f"Using device: {device}")
-
-    # Загрузка данных
-    texts, labels = load_and_prepare_data(Config.DATASET_PATHS)
+    threads, interop_threads = configure_threads(
+        Config.TORCH_THREADS, Config.TORCH_INTEROP_THREADS, Config.NUM_WORKERS)
+    print(f"Torch threads: {threads} intra-op, {interop_threads} inter-op, "
+          f"{Config.NUM_WORKERS} data loader workers")
+    precision = resolve_precision(Config.PRECISION)
+    accumulation_steps = Config.GRADIENT_ACCUMULATION_STEPS
+    print(f"Precision: {precision}, effective batch size: "
+          f"{Config.BATCH_SIZE} x {accumulation_steps} = {Config.BATCH_SIZE * accumulation_steps}")
 
     # Инициализация токенизатора и модели
     tokenizer = AutoTokenizer.from_pretrained(Config.MODEL_NAME)
+
+    # Загрузка данных: CSV читаются и токенизируются, только если нет кэша
+    cache_path = prepare_token_cache(
+        Config.TOKEN_CACHE_DIR, Config.DATASET_PATHS, tokenizer,
+        Config.MODEL_NAME, Config.MAX_LEN, 'multi_hot',
+        lambda: load_and_prepare_data(Config.DATASET_PATHS),
+        labels_config={'classes': Config.CLASSES, 'version': LABELS_VERSION}
+    )
+
     model = AutoModelForSequenceClassification.from_pretrained(
         Config.MODEL_NAME,
         num_labels=len(Config.CLASSES),
@@ -153,7 +149,7 @@ def train_model():
     model.classifier.bias.requires_grad = True
 
     # Создание даталоадеров
-    train_loader, val_loader = create_data_loaders(texts, labels, tokenizer)
+    train_loader, val_loader = create_data_loaders(cache_path)
 
     # Оптимизатор и шедулер
     optimizer = AdamW(
@@ -162,7 +158,8 @@ def train_model():
         weight_decay=Config.WEIGHT_DECAY
     )
 
-    total_steps = len(train_loader) * Config.EPOCHS
+    steps_per_epoch = (len(train_loader) + accumulation_steps - 1) // accumulation_steps
+    total_steps = steps_per_epoch * Config.EPOCHS
     scheduler = get_linear_schedule_with_warmup(
         optimizer,
         num_warmup_steps=Config.NUM_WARMUP_STEPS,
@@ -173,6 +170,8 @@ def train_model():
     start_epoch = 0
     best_val_acc = 0.0
     epochs_without_improvement = 0
+    train_summaries = []
+    metrics = {}
 
     if os.path.exists(Config.MODEL_SAVE_PATH):
         print("Loading saved model and optimizer states...")
@@ -196,29 +195,34 @@ def train_model():
         model.train()
         train_loss = 0.0
         train_acc = 0.0
+        train_stats = EpochStats(Config.MAX_LEN)
+        optimizer.zero_grad()
 
-        for batch in tqdm(train_loader, desc="Training"):
+        for step, batch in enumerate(tqdm(train_loader, desc="Training")):
             input_ids = batch['input_ids'].to(device)
             attention_mask = batch['attention_mask'].to(device)
             labels = batch['labels'].to(device)
 
-            optimizer.zero_grad()
-
-            outputs = model(
-                input_ids=input_ids,
-                attention_mask=attention_mask,
-                labels=labels
-            )
+            with autocast(precision):
+                outputs = model(
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    labels=labels
+                )
 
             loss = outputs.loss
             logits = outputs.logits
 
-            loss.backward()
-            optimizer.step()
-            scheduler.step()
+            # Градиенты копятся, пока не наберётся эффективная пачка
+            (loss / accumulation_steps).backward()
+            if (step + 1) % accumulation_steps == 0 or step + 1 == len(train_loader):
+                optimizer.step()
+                scheduler.step()
+                optimizer.zero_grad()
 
             train_loss += loss.item()
             train_acc += multi_label_accuracy(logits, labels).item()
+            train_stats.update(attention_mask)
 
         train_loss /= len(train_loader)
         train_acc /= len(train_loader)
@@ -227,6 +231,7 @@ def train_model():
         model.eval()
         val_loss = 0.0
         val_acc = 0.0
+        val_stats = EpochStats(Config.MAX_LEN)
 
         with torch.no_grad():
             for batch in tqdm(val_loader, desc="Validation"):
@@ -234,23 +239,29 @@ def train_model():
                 attention_mask = batch['attention_mask'].to(device)
                 labels = batch['labels'].to(device)
 
-                outputs = model(
-                    input_ids=input_ids,
-                    attention_mask=attention_mask,
-                    labels=labels
-                )
+                with autocast(precision):
+                    outputs = model(
+                        input_ids=input_ids,
+                        attention_mask=attention_mask,
+                        labels=labels
+                    )
 
                 loss = outputs.loss
                 logits = outputs.logits
 
                 val_loss += loss.item()
                 val_acc += multi_label_accuracy(logits, labels).item()
+                val_stats.update(attention_mask)
 
         val_loss /= len(val_loader)
         val_acc /= len(val_loader)
 
         print(f"Train Loss: {train_loss:.4f} | Train Acc: {train_acc:.4f}")
         print(f"Val Loss: {val_loss:.4f} | Val Acc: {val_acc:.4f}")
+        print(train_stats.report("Train"))
+        print(val_stats.report("Val"))
+        train_summaries.append(train_stats.summary())
+        metrics = {'val_loss': val_loss, 'val_acc': val_acc}
 
         # Сохранение модели и оптимизатора
         if val_acc > best_val_acc:
@@ -277,6 +288,11 @@ def train_model():
                 break
 
     print(f"\nTraining complete. Best val acc: {best_val_acc:.4f}")
+    if train_summaries:
+        save_run_report(Config.TRAINING_REPORT_PATH, run_report(
+            'train_raw', precision, Config.BATCH_SIZE, accumulation_steps, train_summaries,
+            {**metrics, 'best_val_acc': best_val_acc}
+        ))
 
 
 if __name__ == "__main__":
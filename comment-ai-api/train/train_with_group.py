@@ -1,22 +1,28 @@
 import os
+import sys
 import pandas as pd
 import numpy as np
 import torch
 import torch.nn as nn
-from torch.utils.data import Dataset, DataLoader
 from transformers import BertTokenizer, BertModel, get_linear_schedule_with_warmup
 from torch.optim import AdamW
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
+from sklearn.metrics import classification_report, f1_score
 from tqdm import tqdm
-import re
-import string
-from collections import defaultdict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from text_preprocessing import preprocess_batch
+from training_data import EpochStats, TokenizedDataset, create_data_loader, prepare_token_cache
+from training_runtime import autocast, configure_threads, resolve_precision, run_report, save_run_report
+from labels import LABELS_VERSION, grouped_labels
 
 DEVICE = 'cpu'
 
 # Настройки
-BATCH_SIZE = 64
+BATCH_SIZE = 64  # Пачка одного шага (прямой и обратный проход)
+# Шаг оптимизатора - раз в GRADIENT_ACCUMULATION_STEPS пачек, эффективная
+# пачка - BATCH_SIZE * GRADIENT_ACCUMULATION_STEPS
+GRADIENT_ACCUMULATION_STEPS = 1
 MAX_LEN = 96
 EPOCHS = 2
 LEARNING_RATE = 3e-5
@@ -74,40 +80,25 @@ DATASET_PATHS = [
     # '.\\train\\testtransl.csv',
 ]
 
-# Токенизатор
-tokenizer = BertTokenizer.from_pretrained(TOKENIZER_NAME)
+# Токенизированный набор (см. training_data.py)
+TOKEN_CACHE_DIR = 'token_cache'
+# Дополнение до самого длинного примера пачки и пачки из примеров близкой длины
+DYNAMIC_PADDING = True
+GROUP_BY_LENGTH = True
 
+# Загрузка данных и потоки torch (подбор - train/bench_loader.py)
+NUM_WORKERS = 2
+PREFETCH_FACTOR = 2
+TORCH_THREADS = None  # None - доступные ядра за вычетом NUM_WORKERS
+TORCH_INTEROP_THREADS = 1
 
-class EmotionDataset(Dataset):
-    def __init__(self, texts, labels, tokenizer, max_len):
-        self.texts = texts
-        self.labels = labels
-        self.tokenizer = tokenizer
-        self.max_len = max_len
-
-    def __len__(self):
-        return len(self.texts)
-
-    def __getitem__(self, idx):
-        text = str(self.texts[idx])
-        label = self.labels[idx]
-
-        encoding = self.tokenizer.encode_plus(
-            text,
-            add_special_tokens=True,
-            max_length=self.max_len,
-            return_token_type_ids=False,
-            padding='max_length',
-            truncation=True,
-            return_attention_mask=True,
-            return_tensors='pt'
-        )
+# 'fp32' или 'bf16' (autocast, только на CPU с AVX512-BF16 / AMX)
+PRECISION = 'fp32'
+# Отчёты о запусках (JSON Lines) для сравнения bf16 с fp32
+TRAINING_REPORT_PATH = 'training_report.jsonl'
 
-        return {
-            'input_ids': encoding['input_ids'].flatten(),
-            'attention_mask': encoding['attention_mask'].flatten(),
-            'label': torch.tensor(label, dtype=torch.long)
-        }
+# Токенизатор
+tokenizer = BertTokenizer.from_pretrained(TOKENIZER_NAME)
 
 
 class EmotionClassifier(nn.Module):
@@ -127,38 +118,6 @@ class EmotionClassifier(nn.Module):
         return self.out(output)
 
 
-def preprocess_text(text):
-    # Удаление URL
-    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-    # Удаление упоминаний пользователей
-    text = re.sub(r'@\w+', '', text)
-    # Удаление HTML тегов
-    text = re.sub(r'<.*?>', '', text)
-    # Удаление пунктуации
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    # Удаление лишних пробелов
-    text = re.sub(r'\s+', ' ', text).strip()
-    # Приведение к нижнему регистру
-    text = text.lower()
-    return text
-
-
-def process_emotion_row(row):
-    emotion_counts = defaultdict(int)
-
-    for col, target in EMOTION_MAPPING.items():
-        if target is None or row[col] != 1:
-            continue
-        emotion_counts[target] += 1
-
-    result = None  # Будут пропущены случаи с конфликтом эмоций
-    if not emotion_counts:
-        result = 'neutral'
-    elif len(emotion_counts) == 1:
-        result = list(emotion_counts.keys())[0]
-    return result
-
-
 def load_data_in_batches(dataset_paths, batch_size=10000):
     """Генератор для пакетной загрузки данных"""
     for path in dataset_paths:
@@ -184,16 +143,16 @@ def load_and_preprocess_data(dataset_paths):
         if len(batch) == 0:
             continue
 
-        # Определение эмоций
-        batch['emotion'] = batch.apply(process_emotion_row, axis=1)
-        batch = batch[batch['emotion'].notna()]
+        # Определение эмоций (-1 - конфликт эмоций, такие случаи пропускаются)
+        batch = batch.assign(emotion=grouped_labels(batch, EMOTION_MAPPING, TARGET_EMOTIONS))
+        batch = batch[batch['emotion'] >= 0]
 
         if len(batch) == 0:
             continue
 
         # Предобработка текста
-        batch['processed_text'] = batch['translated_text'].apply(
-            preprocess_text)
+        batch['processed_text'] = preprocess_batch(
+            batch['translated_text'].tolist())
 
         # Собираем результаты
         all_texts.extend(batch['processed_text'].tolist())
@@ -202,27 +161,45 @@ def load_and_preprocess_data(dataset_paths):
     if not all_texts:
         raise ValueError("No valid data found after preprocessing")
 
-    return all_texts, [EMOTION_TO_IDX[e] for e in all_emotions]
+    return all_texts, all_emotions
 
 
 def main():
-    # Загрузка и предобработка данных
+    threads, interop_threads = configure_threads(TORCH_THREADS, TORCH_INTEROP_THREADS, NUM_WORKERS)
+    print(f"Torch threads: {threads} intra-op, {interop_threads} inter-op, "
+          f"{NUM_WORKERS} data loader workers")
+    precision = resolve_precision(PRECISION)
+    print(f"Precision: {precision}, effective batch size: "
+          f"{BATCH_SIZE} x {GRADIENT_ACCUMULATION_STEPS} = {BATCH_SIZE * GRADIENT_ACCUMULATION_STEPS}")
+
+    # Загрузка и предобработка данных: только если нет токенизированного кэша
     print("Loading and preprocessing data...")
-    texts, labels = load_and_preprocess_data(DATASET_PATHS)
+    cache_path = prepare_token_cache(
+        TOKEN_CACHE_DIR, DATASET_PATHS, tokenizer, TOKENIZER_NAME, MAX_LEN,
+        'grouped', lambda: load_and_preprocess_data(DATASET_PATHS),
+        labels_config={'mapping': EMOTION_MAPPING, 'targets': TARGET_EMOTIONS, 'version': LABELS_VERSION}
+    )
+    dataset = TokenizedDataset(cache_path, label_key='label', label_dtype=torch.long)
+    labels = dataset.labels()
 
     # Разделение на train и test
-    train_texts, test_texts, train_labels, test_labels = train_test_split(
-        texts, labels, test_size=0.2, random_state=42, stratify=labels
+    train_indices, test_indices = train_test_split(
+        dataset.indices, test_size=0.2, random_state=42, stratify=labels
     )
 
     # Создание датасетов и даталоадеров
-    train_dataset = EmotionDataset(
-        train_texts, train_labels, tokenizer, MAX_LEN)
-    test_dataset = EmotionDataset(test_texts, test_labels, tokenizer, MAX_LEN)
-
-    train_loader = DataLoader(
-        train_dataset, batch_size=BATCH_SIZE, shuffle=True)
-    test_loader = DataLoader(test_dataset, batch_size=BATCH_SIZE)
+    train_dataset = TokenizedDataset(
+        cache_path, train_indices, label_key='label', label_dtype=torch.long)
+    test_dataset = TokenizedDataset(
+        cache_path, test_indices, label_key='label', label_dtype=torch.long)
+
+    loader_options = dict(
+        max_len=MAX_LEN, dynamic_padding=DYNAMIC_PADDING, group_by_length=GROUP_BY_LENGTH,
+        num_workers=NUM_WORKERS, prefetch_factor=PREFETCH_FACTOR,
+    )
+    train_loader = create_data_loader(
+        train_dataset, BATCH_SIZE, shuffle=True, **loader_options)
+    test_loader = create_data_loader(test_dataset, BATCH_SIZE, **loader_options)
 
     # Инициализация модели
     model = EmotionClassifier(len(TARGET_EMOTIONS)).to(DEVICE)
@@ -230,7 +207,9 @@ def main():
     # Подготовка к дообучению
     start_epoch = 0
     best_accuracy = 0
-    total_steps = len(train_loader) * EPOCHS
+    steps_per_epoch = (len(train_loader) + GRADIENT_ACCUMULATION_STEPS - 1) // GRADIENT_ACCUMULATION_STEPS
+    total_steps = steps_per_epoch * EPOCHS
+    train_summaries = []
 
     # Инициализация оптимизатора и шедулера
     optimizer = AdamW(model.parameters(), lr=LEARNING_RATE)
@@ -277,49 +256,56 @@ def main():
         # Обучение
         model.train()
         train_loss = 0
-        for batch in tqdm(train_loader, desc="Training"):
-            # Перенос данных на GPU
-            input_ids = batch['input_ids'].to(DEVICE, non_blocking=True)
-            attention_mask = batch['attention_mask'].to(
-                DEVICE, non_blocking=True)
-            labels = batch['label'].to(DEVICE, non_blocking=True)
-
-            # Обнуление градиентов
-            optimizer.zero_grad(set_to_none=True)
-
-            # Прямой проход
-            outputs = model(input_ids=input_ids, attention_mask=attention_mask)
-            loss = nn.CrossEntropyLoss()(outputs, labels)
-
-            # Обратный проход
-            loss.backward()
-            torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
-            optimizer.step()
-            scheduler.step()
+        train_stats = EpochStats(MAX_LEN)
+        optimizer.zero_grad(set_to_none=True)
+        for step, batch in enumerate(tqdm(train_loader, desc="Training")):
+            input_ids = batch['input_ids'].to(DEVICE)
+            attention_mask = batch['attention_mask'].to(DEVICE)
+            labels = batch['label'].to(DEVICE)
+
+            # Прямой проход (функция потерь - в fp32 и при bf16)
+            with autocast(precision):
+                outputs = model(input_ids=input_ids, attention_mask=attention_mask)
+            loss = nn.CrossEntropyLoss()(outputs.float(), labels)
+
+            # Обратный проход: градиенты копятся, пока не наберётся эффективная пачка
+            (loss / GRADIENT_ACCUMULATION_STEPS).backward()
+            if (step + 1) % GRADIENT_ACCUMULATION_STEPS == 0 or step + 1 == len(train_loader):
+                torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+                optimizer.step()
+                scheduler.step()
+                # Обнуление градиентов
+                optimizer.zero_grad(set_to_none=True)
 
             train_loss += loss.item()
+            train_stats.update(attention_mask)
 
         # Валидация
         model.eval()
         test_preds, test_true = [], []
+        test_stats = EpochStats(MAX_LEN)
         with torch.no_grad():
             for batch in tqdm(test_loader, desc="Evaluating"):
-                input_ids = batch['input_ids'].to(DEVICE, non_blocking=True)
-                attention_mask = batch['attention_mask'].to(
-                    DEVICE, non_blocking=True)
-                labels = batch['label'].to(DEVICE, non_blocking=True)
+                input_ids = batch['input_ids'].to(DEVICE)
+                attention_mask = batch['attention_mask'].to(DEVICE)
+                labels = batch['label'].to(DEVICE)
 
-                outputs = model(input_ids=input_ids,
-                                attention_mask=attention_mask)
+                with autocast(precision):
+                    outputs = model(input_ids=input_ids,
+                                    attention_mask=attention_mask)
                 preds = torch.argmax(outputs, dim=1)
 
                 test_preds.extend(preds.cpu().numpy())
                 test_true.extend(labels.cpu().numpy())
+                test_stats.update(attention_mask)
 
         # Расчет метрик
         accuracy = np.mean(np.array(test_preds) == np.array(test_true))
         print(
             f"Train loss: {train_loss/len(train_loader):.4f} | Test accuracy: {accuracy:.4f}")
+        print(train_stats.report("Train"))
+        print(test_stats.report("Test"))
+        train_summaries.append(train_stats.summary())
 
         # Сохранение лучшей модели и полного состояния
         if accuracy > best_accuracy:
@@ -348,6 +334,13 @@ def main():
         target_names=[IDX_TO_EMOTION[idx] for idx in unique_labels],
         zero_division=0
     ))
+    save_run_report(TRAINING_REPORT_PATH, run_report(
+        'train_with_group', precision, BATCH_SIZE, GRADIENT_ACCUMULATION_STEPS, train_summaries, {
+            'accuracy': accuracy,
+            'macro_f1': f1_score(test_true, test_preds, average='macro', zero_division=0),
+            'best_accuracy': best_accuracy,
+        }
+    ))
 
 
 if __name__ == '__main__':
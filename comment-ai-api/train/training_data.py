@@ -0,0 +1,324 @@
+"""
+Кэш токенизированного обучающего набора: CSV читаются, предобрабатываются
+и токенизируются один раз, результат сохраняется в .npy-массивы, которые
+затем открываются через mmap. Датасет читает из них id токенов без
+токенизации и без загрузки всего набора в память; до общей длины пачки
+их дополняет DynamicPaddingCollator, а LengthGroupedBatchSampler собирает
+в пачки примеры близкой длины.
+
+Каталог кэша определяется именем токенизатора, MAX_LEN, версией
+предобработки, способом построения меток и его параметрами (классы,
+отображение эмоций, версия правил фильтрации) и самими CSV (путь, размер,
+время изменения) - при изменении любого из них кэш строится заново.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset, Sampler
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from text_preprocessing import PREPROCESSING_VERSION
+
+# Файлы кэша: id токенов всех текстов подряд, смещения начала каждого
+# текста (len + 1) и метки
+INPUT_IDS_FILE = 'input_ids.npy'
+OFFSETS_FILE = 'offsets.npy'
+LABELS_FILE = 'labels.npy'
+META_FILE = 'meta.json'
+
+
+def cache_key(dataset_paths, tokenizer_name, max_len, labels_kind, labels_config=None):
+    """
+    Ключ кэша - хэш от параметров токенизации, предобработки, меток и исходных файлов
+    Args:
+        labels_config: JSON-совместимые параметры построения меток (классы,
+            отображение, версия правил) - от них зависят сохранённые метки
+    """
+    parts = {
+        'tokenizer': tokenizer_name,
+        'max_len': max_len,
+        'preprocessing_version': PREPROCESSING_VERSION,
+        'labels': labels_kind,
+        'labels_config': hashlib.sha256(
+            json.dumps(labels_config, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest(),
+        'datasets': [],
+    }
+    for path in dataset_paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            parts['datasets'].append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+        else:
+            parts['datasets'].append([os.path.abspath(path), None, None])
+    digest = hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+    return digest[:16], parts
+
+
+def build_token_cache(path, texts, labels, tokenizer, max_len, meta=None, chunk_size=10000):
+    """
+    Токенизация текстов пачками и запись массивов кэша в каталог path
+    Args:
+        labels (array-like): Метки (multi-hot или индексы классов), хранятся как int8
+    """
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    lengths = np.empty(len(texts), dtype=np.int64)
+    chunks = []
+    for start in range(0, len(texts), chunk_size):
+        encodings = tokenizer(
+            [str(text) for text in texts[start:start + chunk_size]],
+            add_special_tokens=True,
+            max_length=max_len,
+            truncation=True,
+        )['input_ids']
+        lengths[start:start + len(encodings)] = [len(ids) for ids in encodings]
+        chunks.append(np.fromiter(
+            (token for ids in encodings for token in ids), dtype=np.int32
+        ))
+
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    np.save(os.path.join(tmp_path, INPUT_IDS_FILE), np.concatenate(chunks) if chunks else np.empty(0, np.int32))
+    np.save(os.path.join(tmp_path, OFFSETS_FILE), offsets)
+    np.save(os.path.join(tmp_path, LABELS_FILE), np.asarray(labels, dtype=np.int8))
+    with open(os.path.join(tmp_path, META_FILE), 'w') as file:
+        json.dump({
+            **(meta or {}),
+            'size': len(texts),
+            'tokens': int(offsets[-1]),
+            'pad_token_id': tokenizer.pad_token_id,
+        }, file, indent=2)
+
+    # Каталог появляется целиком или не появляется вовсе
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def prepare_token_cache(cache_dir, dataset_paths, tokenizer, tokenizer_name, max_len, labels_kind, load_data,
+                        labels_config=None):
+    """
+    Путь к кэшу токенизированного набора; при отсутствии кэш строится
+    Args:
+        cache_dir (str): Корневой каталог кэшей
+        labels_kind (str): Имя способа построения меток (часть ключа)
+        load_data (callable): () -> (тексты, метки), вызывается только при
+            построении кэша
+        labels_config: Параметры построения меток (часть ключа, см. cache_key)
+    Returns:
+        str: Каталог с массивами для TokenizedDataset
+    """
+    key, meta = cache_key(dataset_paths, tokenizer_name, max_len, labels_kind, labels_config)
+    path = os.path.join(cache_dir, f'{labels_kind}-{key}')
+    if os.path.exists(os.path.join(path, META_FILE)):
+        print(f'Using token cache {path}')
+        return path
+
+    texts, labels = load_data()
+    print(f'Tokenizing {len(texts)} texts into {path}...')
+    build_token_cache(path, texts, labels, tokenizer, max_len, meta)
+    return path
+
+
+class TokenizedDataset(Dataset):
+    """
+    Датасет поверх кэша из prepare_token_cache. Массивы открываются через
+    mmap лениво, в каждом процессе отдельно (в том числе в воркерах DataLoader)
+    """
+
+    def __init__(self, path, indices=None, label_key='labels', label_dtype=torch.float32):
+        """
+        Args:
+            path (str): Каталог кэша
+            indices (array-like): Подмножество примеров (None - все)
+            label_key (str): Ключ метки в словаре примера
+            label_dtype (torch.dtype): float32 для multi-hot, long для индекса класса
+        """
+        self.path = path
+        self.label_key = label_key
+        self.label_dtype = label_dtype
+        self._arrays = None
+        with open(os.path.join(path, META_FILE)) as file:
+            meta = json.load(file)
+        self.pad_token_id = meta['pad_token_id']
+        if indices is None:
+            indices = np.arange(meta['size'])
+        self.indices = np.asarray(indices, dtype=np.int64)
+
+    def _open(self):
+        if self._arrays is None:
+            self._arrays = tuple(
+                np.load(os.path.join(self.path, name), mmap_mode='r')
+                for name in (INPUT_IDS_FILE, OFFSETS_FILE, LABELS_FILE)
+            )
+        return self._arrays
+
+    def __getstate__(self):
+        # В воркеры DataLoader передаётся только путь, не содержимое mmap
+        return {**self.__dict__, '_arrays': None}
+
+    def __len__(self):
+        return len(self.indices)
+
+    def token_ids(self, idx):
+        """id токенов примера без дополнения"""
+        input_ids, offsets, _ = self._open()
+        i = self.indices[idx]
+        return input_ids[offsets[i]:offsets[i + 1]]
+
+    def __getitem__(self, idx):
+        """Пример без дополнения - id токенов дополняет DynamicPaddingCollator"""
+        return {
+            'input_ids': torch.from_numpy(self.token_ids(idx).astype(np.int64)),
+            self.label_key: torch.tensor(self._open()[2][self.indices[idx]], dtype=self.label_dtype),
+        }
+
+    def lengths(self):
+        """Длины примеров подмножества в токенах (numpy)"""
+        offsets = self._open()[1]
+        return offsets[self.indices + 1] - offsets[self.indices]
+
+    def labels(self):
+        """Метки всех примеров подмножества (numpy)"""
+        return np.asarray(self._open()[2][self.indices])
+
+
+class DynamicPaddingCollator:
+    """
+    Сборка пачки из примеров TokenizedDataset: id токенов дополняются до
+    самого длинного примера в пачке (или до фиксированной длины pad_to)
+    """
+
+    def __init__(self, pad_token_id, label_key='labels', pad_to=None):
+        """
+        Args:
+            pad_to (int): Фиксированная длина (None - по самому длинному примеру)
+        """
+        self.pad_token_id = pad_token_id
+        self.label_key = label_key
+        self.pad_to = pad_to
+
+    def __call__(self, samples):
+        length = self.pad_to or max(len(sample['input_ids']) for sample in samples)
+        input_ids = torch.full((len(samples), length), self.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(samples), length), dtype=torch.long)
+        for row, sample in enumerate(samples):
+            ids = sample['input_ids']
+            input_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
+
+        return {
+            'input_ids': input_ids,
+            'attention_mask': attention_mask,
+            self.label_key: torch.stack([sample[self.label_key] for sample in samples]),
+        }
+
+
+class LengthGroupedBatchSampler(Sampler):
+    """
+    Пачки из примеров близкой длины при сохранении случайности: индексы
+    перемешиваются, делятся на группы по batch_size * group_factor примеров,
+    внутри группы сортируются по длине и режутся на пачки, порядок пачек
+    снова перемешивается. Без shuffle - пачки по всему набору, отсортированному
+    по длине (для валидации)
+    """
+
+    def __init__(self, lengths, batch_size, shuffle=True, group_factor=50, seed=42):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.group_factor = group_factor
+        self.seed = seed
+        self.epoch = 0
+
+    def __len__(self):
+        return (len(self.lengths) + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        if not self.shuffle:
+            order = np.argsort(-self.lengths, kind='stable')
+            for start in range(0, len(order), self.batch_size):
+                yield order[start:start + self.batch_size].tolist()
+            return
+
+        # Каждая эпоха - своя перестановка, воспроизводимая по seed
+        rnd = np.random.default_rng(self.seed + self.epoch)
+        self.epoch += 1
+        order = rnd.permutation(len(self.lengths))
+        group_size = self.batch_size * self.group_factor
+        batches = []
+        for start in range(0, len(order), group_size):
+            group = order[start:start + group_size]
+            group = group[np.argsort(-self.lengths[group], kind='stable')]
+            batches.extend(group[i:i + self.batch_size] for i in range(0, len(group), self.batch_size))
+        for batch_index in rnd.permutation(len(batches)):
+            yield batches[batch_index].tolist()
+
+
+def create_data_loader(dataset, batch_size, shuffle=False, max_len=None, dynamic_padding=True,
+                       group_by_length=True, num_workers=0, prefetch_factor=2):
+    """
+    DataLoader поверх TokenizedDataset
+    Args:
+        max_len (int): Длина дополнения без dynamic_padding
+        dynamic_padding (bool): Дополнять до самого длинного примера пачки, а не до max_len
+        group_by_length (bool): Собирать пачки из примеров близкой длины
+        num_workers (int): Процессы сборки пачек (0 - в основном процессе)
+        prefetch_factor (int): Пачек, заранее готовящихся каждым воркером
+    """
+    collator = DynamicPaddingCollator(
+        dataset.pad_token_id, dataset.label_key, pad_to=None if dynamic_padding else max_len
+    )
+    options = {'collate_fn': collator, 'num_workers': num_workers}
+    if num_workers > 0:
+        # Воркеры живут между эпохами: mmap кэша открывается в каждом один раз
+        options.update(persistent_workers=True, prefetch_factor=prefetch_factor)
+    if group_by_length:
+        sampler = LengthGroupedBatchSampler(dataset.lengths(), batch_size, shuffle=shuffle)
+        return DataLoader(dataset, batch_sampler=sampler, **options)
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle, **options)
+
+
+class EpochStats:
+    """Пропускная способность и доля реальных (не дополняющих) токенов за эпоху"""
+
+    def __init__(self, max_len):
+        """
+        Args:
+            max_len (int): MAX_LEN - для сравнения с дополнением до фиксированной длины
+        """
+        self.max_len = max_len
+        self.samples = 0
+        self.tokens = 0
+        self.padded_tokens = 0
+        self.started_at = time.perf_counter()
+
+    def update(self, attention_mask):
+        self.samples += attention_mask.size(0)
+        self.tokens += int(attention_mask.sum())
+        self.padded_tokens += attention_mask.numel()
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started_at
+        return {
+            'samples': self.samples,
+            'seconds': elapsed,
+            'samples_s': self.samples / elapsed if elapsed else 0.0,
+            'padding_efficiency': self.tokens / self.padded_tokens if self.padded_tokens else 0.0,
+            'static_padding_efficiency': self.tokens / (self.samples * self.max_len) if self.samples else 0.0,
+        }
+
+    def report(self, name):
+        summary = self.summary()
+        return (
+            f"{name}: {summary['samples_s']:.1f} samples/s | "
+            f"padding efficiency {summary['padding_efficiency']:.1%} "
+            f"(padding to MAX_LEN: {summary['static_padding_efficiency']:.1%})"
+        )
@@ -0,0 +1,148 @@
+"""
+Настройки среды выполнения обучения на CPU: потоки torch для вычислений
+внутри оператора (intra-op) и между операторами (inter-op), точность
+вычислений (fp32 или bf16 autocast) и отчёт о запуске обучения для
+сравнения режимов между собой
+"""
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+
+import torch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Тот же замер, что в бенчмарках и convert_model.py
+from benchmarks.measure import peak_rss_mb
+
+PRECISIONS = ('fp32', 'bf16')
+
+
+def available_cores():
+    """Ядра, доступные процессу (с учётом taskset / cgroup affinity)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def configure_threads(num_threads=None, interop_threads=None, num_workers=0):
+    """
+    Потоки torch для обучения. Вызывается до первых вычислений: число
+    inter-op потоков torch позволяет задать только один раз
+    Args:
+        num_threads (int): intra-op потоки (None - доступные ядра за вычетом
+            воркеров DataLoader, которые сами работают в один поток)
+        interop_threads (int): inter-op потоки (None - по умолчанию torch)
+        num_workers (int): Воркеры DataLoader
+    Returns:
+        tuple: (intra-op, inter-op) потоки после настройки
+    """
+    if num_threads is None:
+        num_threads = max(1, available_cores() - num_workers)
+    torch.set_num_threads(num_threads)
+    if interop_threads is not None and interop_threads != torch.get_num_interop_threads():
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as error:
+            print(f"Can't set inter-op threads: {error}")
+    return torch.get_num_threads(), torch.get_num_interop_threads()
+
+
+def bf16_supported():
+    """Есть ли у CPU нативные bf16-инструкции (AVX512-BF16 / AMX); без них bf16 медленнее fp32"""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def resolve_precision(precision):
+    """
+    Точность обучения: bf16 на CPU без его поддержки заменяется на fp32
+    Args:
+        precision (str): 'fp32' или 'bf16'
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision}. Expected one of {PRECISIONS}")
+    if precision == 'bf16' and not bf16_supported():
+        print("This CPU has no native bf16 support, training in fp32")
+        return 'fp32'
+    return precision
+
+
+def autocast(precision):
+    """
+    Контекст прямого прохода: для bf16 - autocast (матричные операции в
+    bfloat16, веса, градиенты и состояние оптимизатора остаются в fp32)
+    """
+    if precision == 'bf16':
+        return torch.autocast('cpu', dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+
+def run_report(script, precision, batch_size, accumulation_steps, epoch_summaries, metrics):
+    """
+    Итог запуска обучения: пропускная способность по всем эпохам, пиковый RSS
+    и финальные метрики валидации
+    Args:
+        epoch_summaries (list): EpochStats.summary() обучающей фазы каждой эпохи
+        metrics (dict): Метрики валидации после последней эпохи
+    """
+    samples = sum(summary['samples'] for summary in epoch_summaries)
+    seconds = sum(summary['seconds'] for summary in epoch_summaries)
+    peak_rss = peak_rss_mb()
+    return {
+        'script': script,
+        'precision': precision,
+        'batch_size': batch_size,
+        'gradient_accumulation_steps': accumulation_steps,
+        'effective_batch_size': batch_size * accumulation_steps,
+        'epochs': len(epoch_summaries),
+        'train_samples_s': round(samples / seconds, 2) if seconds else None,
+        'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+        'metrics': {name: round(float(value), 4) for name, value in metrics.items()},
+        'environment': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'torch': torch.__version__,
+            'torch_threads': torch.get_num_threads(),
+            'cpu_count': os.cpu_count(),
+        },
+    }
+
+
+def save_run_report(path, report):
+    """
+    Дописывает отчёт в JSON Lines файл и печатает сравнение с последним
+    fp32-запуском того же скрипта из этого файла
+    """
+    baseline = None
+    if os.path.exists(path):
+        with open(path) as file:
+            for line in file:
+                previous = json.loads(line)
+                if previous['script'] == report['script'] and previous['precision'] == 'fp32':
+                    baseline = previous
+    with open(path, 'a') as file:
+        file.write(json.dumps(report) + '\n')
+
+    peak_rss = f"{report['peak_rss_mb']:.0f}MB" if report['peak_rss_mb'] is not None else '-'
+    print(f"\n{report['precision']}, batch {report['batch_size']} x {report['gradient_accumulation_steps']}: "
+          f"{report['train_samples_s']} samples/s, peak RSS {peak_rss}, "
+          + ', '.join(f'{name} {value:.4f}' for name, value in report['metrics'].items()))
+    if baseline is None or not baseline['train_samples_s'] or not report['train_samples_s']:
+        return
+    peak_rss_diff = (
+        f"{report['peak_rss_mb'] - baseline['peak_rss_mb']:+.0f}MB"
+        if report['peak_rss_mb'] is not None and baseline['peak_rss_mb'] is not None else '-'
+    )
+    print(f"vs fp32 baseline ({baseline['environment']['timestamp']}): "
+          f"{report['train_samples_s'] / baseline['train_samples_s']:.2f}x samples/s, "
+          f"peak RSS {peak_rss_diff}, "
+          + ', '.join(
+              f"{name} {value - baseline['metrics'][name]:+.4f}"
+              for name, value in report['metrics'].items() if name in baseline['metrics']
+          ))